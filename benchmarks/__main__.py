@@ -0,0 +1,88 @@
+"""
+Micro-benchmarks for serializer construction, plan application and
+representation. Run from the repository root:
+
+    python -m benchmarks [--filter list] [--json results.json]
+                         [--compare baseline.json]
+
+Every case reports operations per second and the peak memory allocated
+by a single call. Results saved with --json can be passed to --compare
+to print the change against that baseline.
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+import tracemalloc
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from benchmarks.cases import CASES  # noqa: E402
+
+
+def measure(func, repeat: int = 3) -> dict:
+    func()
+
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    best = min(timer.repeat(repeat=repeat, number=number))
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {"ops_per_sec": number / best, "peak_bytes": peak}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    parser.add_argument("--filter", default="", help="only run cases containing this")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="compare against results saved with --json")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as infile:
+            baseline = json.load(infile)
+
+    results = {}
+    header = "%-45s %14s %12s" % ("case", "ops/sec", "peak KiB")
+    if baseline:
+        header += " %10s" % "vs base"
+    print(header)
+
+    for name, func in CASES.items():
+        if args.filter not in name:
+            continue
+
+        result = measure(func, repeat=args.repeat)
+        results[name] = result
+        line = "%-45s %14.1f %12.1f" % (
+            name,
+            result["ops_per_sec"],
+            result["peak_bytes"] / 1024,
+        )
+
+        if name in baseline:
+            line += " %9.2fx" % (result["ops_per_sec"] / baseline[name]["ops_per_sec"])
+
+        print(line)
+        sys.stdout.flush()
+
+    if args.json:
+        with open(args.json, "w") as outfile:
+            json.dump(results, outfile, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    main()
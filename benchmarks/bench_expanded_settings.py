@@ -0,0 +1,90 @@
+"""
+Compares the cost of constructing expanded fields when the expandable
+field settings are deep-copied for every expansion (the previous behaviour)
+against layering per-instance options over the frozen per-class settings.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_expanded_settings
+"""
+import copy
+import os
+import timeit
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.validators import MaxLengthValidator  # noqa: E402
+from rest_framework import serializers  # noqa: E402
+
+from rest_flex_fields import FlexFieldsModelSerializer  # noqa: E402
+from tests.testapp.models import Person, Pet  # noqa: E402
+from tests.testapp.serializers import PersonSerializer  # noqa: E402
+
+
+class PetSerializer(FlexFieldsModelSerializer):
+    owner = serializers.PrimaryKeyRelatedField(queryset=Person.objects.all())
+
+    class Meta:
+        model = Pet
+        fields = ["name", "owner"]
+        expandable_fields = {
+            "owner": (
+                PersonSerializer,
+                {
+                    "read_only": True,
+                    "validators": [MaxLengthValidator(n) for n in range(20)],
+                    "help_text": "x" * 2000,
+                    "expand": ["employer"],
+                },
+            ),
+            "sibling": (
+                serializers.PrimaryKeyRelatedField,
+                {
+                    "source": "owner",
+                    "queryset": Person.objects.filter(name__startswith="F"),
+                },
+            ),
+        }
+
+
+class DeepCopyPetSerializer(PetSerializer):
+    """
+    Reproduces the previous behaviour of deep-copying the settings for
+    every expanded field instance.
+    """
+
+    @classmethod
+    def _get_frozen_expandable_field(cls, name, field_options):
+        serializer_class, settings = super()._get_frozen_expandable_field(
+            name, field_options
+        )
+        return serializer_class, copy.deepcopy(dict(settings))
+
+
+def construct(serializer_class):
+    serializer_class(expand=["owner", "sibling"]).fields
+
+
+def main(number=2000):
+    results = {}
+
+    for label, serializer_class in (
+        ("deepcopy", DeepCopyPetSerializer),
+        ("frozen", PetSerializer),
+    ):
+        construct(serializer_class)
+        best = min(
+            timeit.repeat(lambda: construct(serializer_class), number=number, repeat=5)
+        )
+        results[label] = best / number * 1e6
+        print("%-10s %8.1f us per serializer" % (label, results[label]))
+
+    print("speedup    %8.2fx" % (results["deepcopy"] / results["frozen"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+from django.apps import AppConfig
+
+
+class BenchappConfig(AppConfig):
+    name = 'benchmarks.benchapp'
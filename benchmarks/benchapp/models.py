@@ -0,0 +1,46 @@
+from django.db import models
+
+WIDE_FIELD_COUNT = 80
+CHAIN_DEPTH = 4
+
+
+WideRecord = type(
+    "WideRecord",
+    (models.Model,),
+    dict(
+        {"__module__": __name__},
+        **{
+            "field_%02d" % i: models.CharField(max_length=50, default="")
+            for i in range(WIDE_FIELD_COUNT)
+        }
+    ),
+)
+
+
+class Level4(models.Model):
+    name = models.CharField(max_length=30)
+    value = models.IntegerField(default=0)
+
+
+class Level3(models.Model):
+    name = models.CharField(max_length=30)
+    value = models.IntegerField(default=0)
+    child = models.ForeignKey(Level4, on_delete=models.CASCADE)
+
+
+class Level2(models.Model):
+    name = models.CharField(max_length=30)
+    value = models.IntegerField(default=0)
+    child = models.ForeignKey(Level3, on_delete=models.CASCADE)
+
+
+class Level1(models.Model):
+    name = models.CharField(max_length=30)
+    value = models.IntegerField(default=0)
+    child = models.ForeignKey(Level2, on_delete=models.CASCADE)
+
+
+class Level0(models.Model):
+    name = models.CharField(max_length=30)
+    value = models.IntegerField(default=0)
+    child = models.ForeignKey(Level1, on_delete=models.CASCADE)
@@ -0,0 +1,56 @@
+from rest_flex_fields import FlexFieldsModelSerializer
+from rest_flex_fields.serializers import FlexFieldsListSerializer
+from benchmarks.benchapp.models import (
+    WIDE_FIELD_COUNT,
+    Level0,
+    Level1,
+    Level2,
+    Level3,
+    Level4,
+    WideRecord,
+)
+
+
+class WideRecordSerializer(FlexFieldsModelSerializer):
+    class Meta:
+        model = WideRecord
+        fields = ["id"] + ["field_%02d" % i for i in range(WIDE_FIELD_COUNT)]
+
+
+class Level4Serializer(FlexFieldsModelSerializer):
+    class Meta:
+        model = Level4
+        fields = ["id", "name", "value"]
+
+
+class Level3Serializer(FlexFieldsModelSerializer):
+    class Meta:
+        model = Level3
+        fields = ["id", "name", "value", "child"]
+        expandable_fields = {"child": "benchmarks.benchapp.serializers.Level4Serializer"}
+
+
+class Level2Serializer(FlexFieldsModelSerializer):
+    class Meta:
+        model = Level2
+        fields = ["id", "name", "value", "child"]
+        expandable_fields = {"child": "benchmarks.benchapp.serializers.Level3Serializer"}
+
+
+class Level1Serializer(FlexFieldsModelSerializer):
+    class Meta:
+        model = Level1
+        fields = ["id", "name", "value", "child"]
+        expandable_fields = {"child": "benchmarks.benchapp.serializers.Level2Serializer"}
+
+
+class Level0Serializer(FlexFieldsModelSerializer):
+    class Meta:
+        model = Level0
+        fields = ["id", "name", "value", "child"]
+        expandable_fields = {"child": "benchmarks.benchapp.serializers.Level1Serializer"}
+
+
+class CompiledLevel0Serializer(Level0Serializer):
+    class Meta(Level0Serializer.Meta):
+        list_serializer_class = FlexFieldsListSerializer
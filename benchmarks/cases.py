@@ -0,0 +1,132 @@
+"""
+Benchmark cases. Each case is a zero-argument callable registered with
+`@case`; parametrized cases are registered once per parameter combination.
+"""
+from collections import OrderedDict
+from typing import Callable, Dict
+
+from django.utils.datastructures import MultiValueDict
+
+from benchmarks.benchapp.models import (
+    CHAIN_DEPTH,
+    WIDE_FIELD_COUNT,
+    Level0,
+    Level1,
+    Level2,
+    Level3,
+    Level4,
+    WideRecord,
+)
+from benchmarks.benchapp.serializers import (
+    CompiledLevel0Serializer,
+    Level0Serializer,
+    WideRecordSerializer,
+)
+from rest_flex_fields import split_levels
+
+CASES: Dict[str, Callable[[], None]] = OrderedDict()
+
+DEPTHS = range(CHAIN_DEPTH + 1)
+LIST_SIZES = (10, 100, 500)
+
+
+class MockRequest(object):
+    def __init__(self, query_params):
+        self.query_params = MultiValueDict(query_params)
+        self.method = "GET"
+
+
+def case(name: str):
+    def register(func):
+        CASES[name] = func
+        return func
+
+    return register
+
+
+def expand_path(depth: int) -> list:
+    return [".".join(["child"] * depth)] if depth else []
+
+
+def make_chain(index: int = 0) -> Level0:
+    leaf = Level4(id=index, name="level4-%d" % index, value=index)
+    level3 = Level3(id=index, name="level3-%d" % index, value=index, child=leaf)
+    level2 = Level2(id=index, name="level2-%d" % index, value=index, child=level3)
+    level1 = Level1(id=index, name="level1-%d" % index, value=index, child=level2)
+    return Level0(id=index, name="level0-%d" % index, value=index, child=level1)
+
+
+def make_wide_record() -> WideRecord:
+    return WideRecord(
+        id=1, **{"field_%02d" % i: "value %d" % i for i in range(WIDE_FIELD_COUNT)}
+    )
+
+
+def register_cases():
+    paths = ["a.b.c", "a.b.d", "a.e", "f", "g.h.i.j", "g.k", "l", "m.n", "o", "p.q"]
+
+    case("split_levels[paths=10]")(lambda: split_levels(paths))
+
+    for depth in DEPTHS:
+        expand = expand_path(depth)
+
+        case("init[depth=%d]" % depth)(
+            lambda expand=expand: Level0Serializer(expand=expand)
+        )
+
+        request = MockRequest({"expand": [",".join(expand)]})
+        case("init_from_query[depth=%d]" % depth)(
+            lambda request=request: Level0Serializer(context={"request": request})
+        )
+
+        case("apply_flex_fields[depth=%d]" % depth)(
+            lambda expand=expand: Level0Serializer(expand=expand).fields
+        )
+
+    case("apply_flex_fields[wildcard_expand]")(
+        lambda: Level0Serializer(expand=["*"]).fields
+    )
+    case("apply_flex_fields[wildcard_fields]")(
+        lambda: Level0Serializer(fields=["*", "child.name"], expand=["child"]).fields
+    )
+
+    sparse = ["field_00", "field_01", "field_02"]
+    omit = ["field_%02d" % i for i in range(0, WIDE_FIELD_COUNT, 2)]
+    case("apply_flex_fields[wide,fields=all]")(lambda: WideRecordSerializer().fields)
+    case("apply_flex_fields[wide,fields=3]")(
+        lambda: WideRecordSerializer(fields=sparse).fields
+    )
+    case("apply_flex_fields[wide,omit=half]")(
+        lambda: WideRecordSerializer(omit=omit).fields
+    )
+
+    wide_record = make_wide_record()
+    case("to_representation[wide,fields=all]")(
+        lambda: WideRecordSerializer(wide_record).data
+    )
+    case("to_representation[wide,fields=3]")(
+        lambda: WideRecordSerializer(wide_record, fields=sparse).data
+    )
+
+    for size in LIST_SIZES:
+        rows = [make_chain(i) for i in range(size)]
+
+        for depth in (0, 2, CHAIN_DEPTH):
+            expand = expand_path(depth)
+
+            for label, serializer_class in (
+                ("default", Level0Serializer),
+                ("compiled", CompiledLevel0Serializer),
+            ):
+                case("list[%s,size=%d,depth=%d]" % (label, size, depth))(
+                    lambda rows=rows, expand=expand, serializer_class=serializer_class: (
+                        serializer_class(rows, many=True, expand=expand).data
+                    )
+                )
+
+        case("list[default,size=%d,wildcard_expand]" % size)(
+            lambda rows=rows: Level0Serializer(rows, many=True, expand=["*"]).data
+        )
+
+
+register_cases()
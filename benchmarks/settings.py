@@ -0,0 +1,14 @@
+"""
+Settings for the benchmark suite: the test project plus the synthetic
+models of `benchmarks.benchapp`.
+"""
+from tests.settings import *  # noqa: F401,F403
+
+INSTALLED_APPS = INSTALLED_APPS + ["benchmarks.benchapp"]  # noqa: F405
+
+DATABASES = {
+    "default": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": ":memory:",
+    }
+}
@@ -9,6 +9,25 @@ MAXIMUM_EXPANSION_DEPTH = FLEX_FIELDS_OPTIONS.get("MAXIMUM_EXPANSION_DEPTH", Non
 RECURSIVE_EXPANSION_PERMITTED = FLEX_FIELDS_OPTIONS.get(
     "RECURSIVE_EXPANSION_PERMITTED", True
 )
+PLAN_CACHE_SIZE = FLEX_FIELDS_OPTIONS.get("PLAN_CACHE_SIZE", 512)
+BUILD_ONLY_REQUESTED_FIELDS = FLEX_FIELDS_OPTIONS.get(
+    "BUILD_ONLY_REQUESTED_FIELDS", False
+)
+CACHE_FIELD_TEMPLATES = FLEX_FIELDS_OPTIONS.get("CACHE_FIELD_TEMPLATES", False)
+FIELD_TEMPLATE_CACHE_SIZE = FLEX_FIELDS_OPTIONS.get("FIELD_TEMPLATE_CACHE_SIZE", 64)
+TRACER = FLEX_FIELDS_OPTIONS.get("TRACER", None)
+FRAGMENT_CACHE = FLEX_FIELDS_OPTIONS.get("FRAGMENT_CACHE", "default")
+FRAGMENT_CACHE_TIMEOUT = FLEX_FIELDS_OPTIONS.get("FRAGMENT_CACHE_TIMEOUT", None)
+RESOLVE_EXPANDABLE_FIELDS_ON_STARTUP = FLEX_FIELDS_OPTIONS.get(
+    "RESOLVE_EXPANDABLE_FIELDS_ON_STARTUP", False
+)
+INVALID_EXPAND_PATHS = FLEX_FIELDS_OPTIONS.get("INVALID_EXPAND_PATHS", "ignore")
+EXPANSION_COST_BUDGET = FLEX_FIELDS_OPTIONS.get("EXPANSION_COST_BUDGET", None)
+EXPANSION_COST_ACTION = FLEX_FIELDS_OPTIONS.get("EXPANSION_COST_ACTION", "reject")
+EXPANSION_MANY_FANOUT = FLEX_FIELDS_OPTIONS.get("EXPANSION_MANY_FANOUT", 10)
+GUARD_MAX_QUERIES = FLEX_FIELDS_OPTIONS.get("GUARD_MAX_QUERIES", 10)
+GUARD_MAX_DEFERRED_LOADS = FLEX_FIELDS_OPTIONS.get("GUARD_MAX_DEFERRED_LOADS", 0)
+GUARD_ACTION = FLEX_FIELDS_OPTIONS.get("GUARD_ACTION", "warn")
 
 WILDCARD_ALL = "~all"
 WILDCARD_ASTERISK = "*"
@@ -30,6 +49,40 @@ if type(MAXIMUM_EXPANSION_DEPTH) not in (int, type(None)):
     raise ValueError("'MAXIMUM_EXPANSION_DEPTH' should be a int or None")
 if type(RECURSIVE_EXPANSION_PERMITTED) is not bool:
     raise ValueError("'RECURSIVE_EXPANSION_PERMITTED' should be a bool")
+if type(PLAN_CACHE_SIZE) not in (int, type(None)):
+    raise ValueError("'PLAN_CACHE_SIZE' should be a int or None")
+if type(BUILD_ONLY_REQUESTED_FIELDS) is not bool:
+    raise ValueError("'BUILD_ONLY_REQUESTED_FIELDS' should be a bool")
+if type(CACHE_FIELD_TEMPLATES) is not bool:
+    raise ValueError("'CACHE_FIELD_TEMPLATES' should be a bool")
+if type(FIELD_TEMPLATE_CACHE_SIZE) not in (int, type(None)):
+    raise ValueError("'FIELD_TEMPLATE_CACHE_SIZE' should be a int or None")
+if type(TRACER) not in (str, type(None)):
+    raise ValueError("'TRACER' should be a string or None")
+if type(FRAGMENT_CACHE) is not str:
+    raise ValueError("'FRAGMENT_CACHE' should be a string")
+if type(FRAGMENT_CACHE_TIMEOUT) not in (int, type(None)):
+    raise ValueError("'FRAGMENT_CACHE_TIMEOUT' should be a int or None")
+if type(RESOLVE_EXPANDABLE_FIELDS_ON_STARTUP) is not bool:
+    raise ValueError("'RESOLVE_EXPANDABLE_FIELDS_ON_STARTUP' should be a bool")
+if INVALID_EXPAND_PATHS not in ("ignore", "reject", "strip"):
+    raise ValueError(
+        "'INVALID_EXPAND_PATHS' should be one of 'ignore', 'reject' or 'strip'"
+    )
+if type(EXPANSION_COST_BUDGET) not in (int, float, type(None)):
+    raise ValueError("'EXPANSION_COST_BUDGET' should be a number or None")
+if EXPANSION_COST_ACTION not in ("reject", "downgrade", "paginate"):
+    raise ValueError(
+        "'EXPANSION_COST_ACTION' should be one of 'reject', 'downgrade' or 'paginate'"
+    )
+if type(EXPANSION_MANY_FANOUT) is not int:
+    raise ValueError("'EXPANSION_MANY_FANOUT' should be a int")
+if type(GUARD_MAX_QUERIES) not in (int, type(None)):
+    raise ValueError("'GUARD_MAX_QUERIES' should be a int or None")
+if type(GUARD_MAX_DEFERRED_LOADS) not in (int, type(None)):
+    raise ValueError("'GUARD_MAX_DEFERRED_LOADS' should be a int or None")
+if GUARD_ACTION not in ("warn", "log", "raise"):
+    raise ValueError("'GUARD_ACTION' should be one of 'warn', 'log' or 'raise'")
 
 from .utils import *
 from .serializers import FlexFieldsModelSerializer
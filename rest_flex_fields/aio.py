@@ -0,0 +1,103 @@
+"""
+Async entry points for flex serializers, for views served under ASGI.
+
+Querysets are read in chunks with `aiterator()` on Django 4.1 and later, and
+through `sync_to_async` one chunk at a time otherwise; the queryset's prefetch
+lookups are applied to every chunk. Each chunk is rendered with one
+`sync_to_async` call, so rendering, and any query, cache or loader call it
+makes, never blocks the event loop, and the thread hop is paid per chunk
+rather than per row.
+"""
+from itertools import islice
+from typing import AsyncIterator, List
+
+import django
+from asgiref.sync import sync_to_async
+from django.db import models
+from rest_framework import serializers
+from rest_framework.utils.serializer_helpers import ReturnDict, ReturnList
+
+DEFAULT_CHUNK_SIZE = 2000
+
+# Async queryset iteration (`aiterator()`) was added in Django 4.1. Before
+# that, every read is a `sync_to_async` call, and async views gain nothing.
+ASYNC_QUERYSETS = django.VERSION >= (4, 1)
+
+
+async def aserialize(serializer, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """
+    Async counterpart of `serializer.data` for a serializer constructed with
+    an instance, or with a queryset and `many=True`.
+    """
+    if not isinstance(serializer, serializers.ListSerializer):
+        return ReturnDict(
+            await arepresent(serializer, serializer.instance), serializer=serializer
+        )
+
+    data = serializer.instance
+
+    if isinstance(data, models.Manager):
+        data = data.all()
+
+    if not isinstance(data, models.QuerySet):
+        return ReturnList(
+            await arepresent(serializer, list(data)), serializer=serializer
+        )
+
+    rows = []
+
+    async for chunk in aiter_chunks(data, chunk_size):
+        rows.extend(await arepresent(serializer, chunk))
+
+    return ReturnList(rows, serializer=serializer)
+
+
+async def aiter_chunks(
+    queryset: models.QuerySet, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> AsyncIterator[List[models.Model]]:
+    """
+    Yields the objects of `queryset` as lists of at most `chunk_size`, with
+    the queryset's prefetch lookups applied to each list.
+    """
+    lookups = queryset._prefetch_related_lookups
+    queryset = queryset.prefetch_related(None)
+
+    if ASYNC_QUERYSETS:
+        chunk = []
+
+        async for obj in queryset.aiterator(chunk_size=chunk_size):
+            chunk.append(obj)
+
+            if len(chunk) == chunk_size:
+                yield await _aprefetch(chunk, lookups)
+                chunk = []
+
+        if chunk:
+            yield await _aprefetch(chunk, lookups)
+
+        return
+
+    rows = queryset.iterator(chunk_size=chunk_size)
+    next_chunk = sync_to_async(lambda: list(islice(rows, chunk_size)))
+
+    while True:
+        chunk = await next_chunk()
+
+        if not chunk:
+            return
+
+        yield await _aprefetch(chunk, lookups)
+
+
+async def arepresent(serializer, data):
+    """
+    Returns `serializer.to_representation(data)`, computed in a thread.
+    """
+    return await sync_to_async(serializer.to_representation)(data)
+
+
+async def _aprefetch(chunk: List[models.Model], lookups) -> List[models.Model]:
+    if lookups:
+        await sync_to_async(models.prefetch_related_objects)(chunk, *lookups)
+
+    return chunk
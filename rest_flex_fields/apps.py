@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+
+
+class RestFlexFieldsConfig(AppConfig):
+    name = "rest_flex_fields"
+    verbose_name = "REST Flex Fields"
+
+    def ready(self):
+        from rest_flex_fields import RESOLVE_EXPANDABLE_FIELDS_ON_STARTUP
+        from rest_flex_fields.serializers import resolve_all_expandable_fields
+
+        if RESOLVE_EXPANDABLE_FIELDS_ON_STARTUP:
+            resolve_all_expandable_fields()
@@ -0,0 +1,65 @@
+"""
+Cost estimates of compiled plans, used by FlexFieldsMixin to admit, downgrade
+or paginate expensive expansions before any queryset work starts.
+
+The cost of rendering `rows` objects is `rows`, plus, for every expanded
+field, its weight times the cost of rendering the objects it expands to:
+one per row for to-one relations, and the field's fanout per row for to-many
+(`many=True`) relations, bounded by the expansion's "limit". Weights and
+fanouts are set per serializer class:
+
+    class PersonSerializer(FlexFieldsModelSerializer):
+        expandable_field_weights = {"employer": 2}
+        expandable_field_fanouts = {"pets": 50}
+"""
+from rest_flex_fields import EXPANSION_MANY_FANOUT
+from rest_flex_fields.plans import FlexPlan
+
+
+def estimate_expansion_cost(serializer_class: type, plan: FlexPlan, rows: int = 1) -> float:
+    """
+    Returns the estimated cost of rendering `rows` objects with
+    `serializer_class` and the fields and expansions of `plan`.
+    """
+    cost = float(rows)
+
+    if not plan.expand:
+        return cost
+
+    expandable_fields = serializer_class._get_class_expandable_fields()
+    weights = getattr(serializer_class, "expandable_field_weights", None) or {}
+    fanouts = getattr(serializer_class, "expandable_field_fanouts", None) or {}
+    names = expandable_fields if plan.expand_all else plan.expand
+
+    for name in names:
+        if name not in expandable_fields or not _is_selected(plan, name):
+            continue
+
+        target, settings = serializer_class._get_frozen_expandable_field(
+            name, expandable_fields[name]
+        )
+        fanout = fanouts.get(
+            name, EXPANSION_MANY_FANOUT if settings.get("many") else 1
+        )
+
+        if settings.get("limit") is not None:
+            fanout = min(fanout, settings["limit"])
+
+        nested_rows = rows * fanout
+
+        if hasattr(target, "_get_class_expandable_fields"):
+            nested_cost = estimate_expansion_cost(target, plan.child(name), nested_rows)
+        else:
+            nested_cost = float(nested_rows)
+
+        cost += weights.get(name, 1) * nested_cost
+
+    return cost
+
+
+def _is_selected(plan: FlexPlan, name: str) -> bool:
+    # Expansions removed by "fields" or "omit" are never built.
+    if plan.fields and not plan.include_all and name not in plan.fields:
+        return False
+
+    return name not in plan.omit or name in plan.next_omit
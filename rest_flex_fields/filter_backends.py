@@ -1,9 +1,23 @@
-from functools import lru_cache
-from typing import Optional
+from functools import lru_cache, reduce
+from operator import or_
+from typing import List, Optional, Tuple, Union
 
 from django.core.exceptions import FieldDoesNotExist
-from django.db import models
-from django.db.models import QuerySet
+from django.db import connections, models
+from django.db.models import (
+    BooleanField,
+    F,
+    Func,
+    IntegerField,
+    OuterRef,
+    Prefetch,
+    Q,
+    QuerySet,
+    Subquery,
+    Value,
+)
+from django.db.models.expressions import RawSQL
+from rest_framework import serializers
 from rest_framework.compat import coreapi, coreschema
 from rest_framework.filters import BaseFilterBackend
 from rest_framework.request import Request
@@ -19,9 +33,11 @@ from rest_flex_fields import (
 WILDCARD_VALUES_JOINED = ",".join(WILDCARD_VALUES)
 
 from rest_flex_fields.serializers import (
+    FlexFieldsListSerializer,
     FlexFieldsModelSerializer,
     FlexFieldsSerializerMixin,
 )
+from rest_flex_fields.tracing import get_tracer
 
 
 class FlexFieldsDocsFilterBackend(BaseFilterBackend):
@@ -173,67 +189,287 @@ class FlexFieldsFilterBackend(FlexFieldsDocsFilterBackend):
         ):
             return queryset
 
-        auto_remove_fields_from_query = getattr(
-            view, "auto_remove_fields_from_query", True
-        )
-        auto_select_related_on_query = getattr(
-            view, "auto_select_related_on_query", True
-        )
-        required_query_fields = list(getattr(view, "required_query_fields", []))
-
-        serializer = view.get_serializer(  # type: FlexFieldsSerializerMixin
-            context=view.get_serializer_context()
-        )
+        with get_tracer().span(
+            "flex.filter_queryset",
+            view=type(view).__name__,
+            serializer=view.get_serializer_class().__name__,
+        ) as span:
+            auto_remove_fields_from_query = getattr(
+                view, "auto_remove_fields_from_query", True
+            )
+            auto_select_related_on_query = getattr(
+                view, "auto_select_related_on_query", True
+            )
+            auto_remove_nested_fields_from_query = getattr(
+                view, "auto_remove_nested_fields_from_query", False
+            )
+            required_query_fields = list(getattr(view, "required_query_fields", []))
+
+            if hasattr(view, "get_flex_serializer"):
+                # Shared with the view, which renders with the same tree.
+                serializer = view.get_flex_serializer()
+            else:
+                serializer = view.get_serializer(  # type: FlexFieldsSerializerMixin
+                    context=view.get_serializer_context()
+                )
 
-        serializer.apply_flex_fields(
-            serializer.fields, serializer._flex_options_rep_only
-        )
-        serializer._flex_fields_rep_applied = True
+            serializer._apply_flex_fields_for_representation()
 
-        model_fields = []
-        nested_model_fields = []
-        for field in serializer.fields.values():
-            model_field = self._get_field(field.source, queryset.model)
-            if model_field:
-                model_fields.append(model_field)
-                if field.field_name in serializer.expanded_fields or \
-                        (model_field.is_relation and not model_field.many_to_one) or \
-                        (model_field.is_relation and model_field.many_to_one and not model_field.concrete):  # Include GenericForeignKey
-                    nested_model_fields.append(model_field)
-
-        if auto_remove_fields_from_query:
-            queryset = queryset.only(
-                *(
-                    required_query_fields
-                    + [
-                        model_field.name
-                        for model_field in model_fields if (
-                            not model_field.is_relation or
-                            model_field.many_to_one and model_field.concrete)
-                    ]
-                )
+            only_fields, select_related, prefetch_related = self._get_query_lookups(
+                serializer,
+                queryset.model,
+                follow_relations=auto_select_related_on_query,
+                prune_columns=(
+                    auto_remove_fields_from_query
+                    and auto_remove_nested_fields_from_query
+                ),
             )
 
-        if auto_select_related_on_query and nested_model_fields:
-            queryset = queryset.select_related(
-                *(
-                    model_field.name
-                    for model_field in nested_model_fields if (
-                            model_field.is_relation and
-                            model_field.many_to_one and
-                            model_field.concrete)  # Exclude GenericForeignKey
+            if auto_remove_fields_from_query:
+                queryset = queryset.only(*(required_query_fields + only_fields))
+
+            if auto_select_related_on_query and (select_related or prefetch_related):
+                queryset = queryset.select_related(*select_related)
+                queryset = queryset.prefetch_related(
+                    *self._merge_prefetch_lookups(queryset, prefetch_related)
                 )
+
+            span.set_attribute("select_related", len(select_related))
+            span.set_attribute("prefetch_related", len(prefetch_related))
+
+        return queryset
+
+    def _get_query_lookups(
+        self,
+        serializer: serializers.BaseSerializer,
+        model: models.Model,
+        prefix: str = "",
+        follow_relations: bool = True,
+        prune_columns: bool = True,
+    ) -> Tuple[List[str], List[str], List[Union[str, Prefetch]]]:
+        """
+        Walks the serializer and its nested (expanded) serializers, and
+        returns:
+
+        - the columns needed to serialize it, for `only()`, including the
+          columns of related models joined via select_related when
+          `prune_columns` is set
+        - the select_related lookups for foreign key chains
+        - the prefetch_related lookups for reverse, many-to-many and generic
+          relations; nested serializers behind a prefetch get their own
+          queryset, planned the same way, inside a Prefetch object
+        """
+        only_fields = []
+        select_related = []
+        prefetch_related = []
+        expanded_fields = getattr(serializer, "expanded_fields", [])
+
+        for field in serializer.fields.values():
+            model_field = self._get_field(field.source, model)
+
+            if not model_field:
+                continue
+
+            only_fields.extend(
+                prefix + name for name in self._get_column_names(model_field)
             )
 
-            queryset = queryset.prefetch_related(*(
-                model_field.name for model_field in nested_model_fields if
-                (model_field.is_relation and not model_field.many_to_one) or
-                (model_field.is_relation and model_field.many_to_one and not model_field.concrete)  # Include GenericForeignKey)
+            if not model_field.is_relation or not follow_relations:
+                continue
+
+            nested_serializer = self._get_nested_serializer(field)
+            lookup = prefix + self._get_lookup_name(model_field)
+
+            if model_field.many_to_one and model_field.concrete:
+                if nested_serializer is None:
+                    if field.field_name in expanded_fields:
+                        select_related.append(lookup)
+                    continue
+
+                select_related.append(lookup)
+                nested_only, nested_select, nested_prefetch = self._get_query_lookups(
+                    nested_serializer,
+                    model_field.related_model,
+                    lookup + "__",
+                    follow_relations,
+                    prune_columns,
+                )
+                if prune_columns:
+                    only_fields.extend(nested_only)
+
+                select_related.extend(nested_select)
+                prefetch_related.extend(nested_prefetch)
+            elif nested_serializer is not None and model_field.related_model:
+                prefetch_queryset = self._get_prefetch_queryset(
+                    nested_serializer, model_field, prune_columns
+                )
+                prefetch_related.append(
+                    Prefetch(
+                        lookup,
+                        queryset=self._bound_prefetch_queryset(
+                            prefetch_queryset, field, model_field
+                        ),
+                    )
                 )
+            else:
+                prefetch_related.append(lookup)
+
+        return only_fields, select_related, prefetch_related
+
+    @staticmethod
+    def _merge_prefetch_lookups(
+        queryset: QuerySet, prefetch_related: List[Union[str, Prefetch]]
+    ) -> List[Union[str, Prefetch]]:
+        """
+        Replaces planned Prefetch objects that would conflict with lookups
+        the queryset already prefetches, e.g. from the view's
+        `get_queryset()`, with plain lookups, so the view's own prefetches
+        win instead of Django raising "lookup was already seen with a
+        different queryset".
+        """
+        # noinspection PyProtectedMember
+        existing = [
+            lookup.prefetch_to if isinstance(lookup, Prefetch) else lookup
+            for lookup in queryset._prefetch_related_lookups
+        ]
+
+        if not existing:
+            return prefetch_related
+
+        merged = []
+
+        for lookup in prefetch_related:
+            if isinstance(lookup, Prefetch) and any(
+                path == lookup.prefetch_to
+                or path.startswith(lookup.prefetch_to + "__")
+                for path in existing
+            ):
+                lookup = lookup.prefetch_through
+
+            merged.append(lookup)
+
+        return merged
+
+    def _get_prefetch_queryset(
+        self,
+        serializer: serializers.BaseSerializer,
+        model_field,
+        prune_columns: bool,
+    ) -> QuerySet:
+        model = model_field.related_model
+        queryset = model._default_manager.all()
+        only_fields, select_related, prefetch_related = self._get_query_lookups(
+            serializer, model, prune_columns=prune_columns
+        )
+
+        if prune_columns:
+            queryset = queryset.only(
+                *(only_fields + self._get_prefetch_join_fields(model_field))
             )
 
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+
         return queryset
 
+    @staticmethod
+    def _bound_prefetch_queryset(
+        queryset: QuerySet, field: serializers.Field, model_field
+    ) -> QuerySet:
+        """
+        Orders the rows of a bounded expansion (see the "limit" option of
+        expandable fields), and only fetches the first `limit` rows of each
+        parent, plus one to tell whether the expansion was truncated, in
+        the same query.
+        """
+        if not isinstance(field, FlexFieldsListSerializer):
+            return queryset
+
+        ordering = field.get_bound_ordering()
+
+        if ordering:
+            queryset = queryset.order_by(*ordering)
+
+        if field.limit is None:
+            return queryset
+
+        if hasattr(model_field, "object_id_field_name"):
+            # GenericRelation
+            first_rows = _first_rows_per_parent(
+                queryset,
+                [
+                    model_field.content_type_field_name,
+                    model_field.object_id_field_name,
+                ],
+                ordering,
+                field.limit + 1,
+            )
+        elif model_field.one_to_many:
+            first_rows = _first_rows_per_parent(
+                queryset, [model_field.field.name], ordering, field.limit + 1
+            )
+        elif model_field.many_to_many:
+            first_rows = _first_rows_per_join_row(
+                queryset, model_field, ordering, field.limit + 1
+            )
+        else:
+            return queryset
+
+        if first_rows is None:
+            return queryset
+
+        return queryset.filter(first_rows)
+
+    @staticmethod
+    def _get_column_names(model_field) -> List[str]:
+        """
+        Returns the names to pass to `only()` so that serializing the
+        field doesn't trigger deferred loads.
+        """
+        if hasattr(model_field, "fk_field"):
+            # GenericForeignKey
+            return [model_field.ct_field, model_field.fk_field]
+
+        if getattr(model_field, "concrete", False) and not model_field.many_to_many:
+            return [model_field.name]
+
+        return []
+
+    @staticmethod
+    def _get_prefetch_join_fields(model_field) -> List[str]:
+        """
+        Returns the columns of the prefetched model that Django needs to
+        match prefetched rows back to their parent.
+        """
+        if hasattr(model_field, "object_id_field_name"):
+            # GenericRelation
+            return [
+                model_field.content_type_field_name,
+                model_field.object_id_field_name,
+            ]
+
+        if model_field.auto_created and not model_field.many_to_many:
+            # Reverse foreign key or one-to-one: the foreign key on the
+            # prefetched model points back to the parent.
+            return [model_field.field.name]
+
+        return []
+
+    @staticmethod
+    def _get_nested_serializer(
+        field: serializers.Field,
+    ) -> Optional[serializers.BaseSerializer]:
+        if isinstance(field, serializers.ListSerializer):
+            return field.child
+
+        if isinstance(field, serializers.BaseSerializer):
+            return field
+
+        return None
+
     @staticmethod
     @lru_cache()
     def _get_field(field_name: str, model: models.Model) -> Optional[models.Field]:
@@ -241,4 +477,140 @@ class FlexFieldsFilterBackend(FlexFieldsDocsFilterBackend):
             # noinspection PyProtectedMember
             return model._meta.get_field(field_name)
         except FieldDoesNotExist:
+            pass
+
+        # Reverse relations are looked up by their query name, but
+        # serializers refer to them by accessor name (e.g. "pet_set").
+        # noinspection PyProtectedMember
+        for related_object in model._meta.related_objects:
+            if related_object.get_accessor_name() == field_name:
+                return related_object
+
+        return None
+
+    @staticmethod
+    def _get_lookup_name(model_field) -> str:
+        if hasattr(model_field, "get_accessor_name"):
+            return model_field.get_accessor_name()
+
+        return model_field.name
+
+
+def _first_rows_per_parent(
+    queryset: QuerySet, parent_fields: List[str], ordering, count: int
+) -> Optional[Q]:
+    """
+    Returns a condition that keeps the first `count` rows of `queryset` per
+    value of `parent_fields`, in `ordering`, or None if that can't be
+    expressed for this ordering and database.
+    """
+    siblings = queryset.model._default_manager.filter(
+        **{name: OuterRef(name) for name in parent_fields}
+    )
+    return _first_rows(queryset, siblings, "", ordering, count)
+
+
+def _first_rows_per_join_row(
+    queryset: QuerySet, model_field, ordering, count: int
+) -> Optional[Q]:
+    """
+    Same as `_first_rows_per_parent`, for the prefetch of a many-to-many
+    relation, whose parent is a column of the join table that Django's
+    prefetch joins. The rows are ranked among the join table rows of that
+    parent; the join table is referenced by name, as Django's prefetch
+    itself does to match rows to their parent.
+    """
+    if model_field.auto_created:
+        # Reverse side: the parent is the target of the many-to-many field.
+        field = model_field.field
+        parent_name, target_name = (
+            field.m2m_reverse_field_name(),
+            field.m2m_field_name(),
+        )
+    else:
+        field = model_field
+        parent_name, target_name = (
+            field.m2m_field_name(),
+            field.m2m_reverse_field_name(),
+        )
+
+    through = field.remote_field.through
+    parent_field = through._meta.get_field(parent_name)
+    quote_name = connections[queryset.db].ops.quote_name
+    parent_column = "%s.%s" % (
+        quote_name(through._meta.db_table),
+        quote_name(parent_field.column),
+    )
+    siblings = through._default_manager.filter(
+        **{parent_field.attname: RawSQL(parent_column, ())}
+    )
+    return _first_rows(queryset, siblings, target_name + "__", ordering, count)
+
+
+def _first_rows(
+    queryset: QuerySet, siblings: QuerySet, prefix: str, ordering, count: int
+) -> Optional[Q]:
+    """
+    Returns a condition that keeps the rows of `queryset` that are among
+    the first `count` rows of `siblings` in `ordering`, where `prefix` leads
+    from the siblings' model to the model of `queryset`.
+
+    Django can't filter on window functions here, so rows are selected
+    with a correlated subquery: a sliced `pk IN (...)` where the database
+    supports it, and a count of the parent's rows that sort before each
+    row otherwise (e.g. MySQL, which rejects LIMIT in IN subqueries).
+    """
+    model = queryset.model
+    siblings = siblings.order_by()
+
+    if connections[queryset.db].features.allow_sliced_subqueries_with_in:
+        if prefix:
+            if not all(isinstance(name, str) and name != "?" for name in ordering):
+                return None
+
+            ordering = [
+                ("-" if name.startswith("-") else "") + prefix + name.lstrip("-")
+                for name in ordering
+            ]
+
+        first = siblings.order_by(*ordering).values(prefix + "pk")[:count]
+        return Q(pk__in=Subquery(first))
+
+    keys = []
+
+    for name in ordering:
+        if not isinstance(name, str) or "__" in name or name == "?":
             return None
+
+        keys.append((name.lstrip("-"), name.startswith("-")))
+
+    if not any(name in ("pk", model._meta.pk.name) for name, _ in keys):
+        keys.append(("pk", False))
+
+    # Rows with NULLs in ordering columns compare as unknown, so they are
+    # counted too low and kept; the list serializer still cuts them.
+    before = reduce(
+        or_,
+        [
+            Q(
+                **{prefix + name: OuterRef(name) for name, _ in keys[:position]},
+                **{
+                    "%s%s__%s"
+                    % (prefix, name, "gt" if descending else "lt"): OuterRef(name)
+                },
+            )
+            for position, (name, descending) in enumerate(keys)
+        ],
+    )
+    rank = siblings.filter(before).annotate(
+        _flex_rank=Func(F("pk"), function="COUNT")
+    ).values("_flex_rank")
+    return Q(
+        Func(
+            Subquery(rank, output_field=IntegerField()),
+            Value(count),
+            template="%(expressions)s",
+            arg_joiner=" < ",
+            output_field=BooleanField(),
+        )
+    )
@@ -0,0 +1,191 @@
+"""
+The expansion graph: flex serializer classes as nodes, and their expandable
+fields as edges.
+
+It's compiled for every flex serializer at startup, along with the lazy
+references of their expandable fields (see resolve_all_expandable_fields),
+and extended lazily for classes defined later. Root serializers use it to
+validate the requested expand paths in one pass, before any nested
+serializer is built (see INVALID_EXPAND_PATHS).
+"""
+from types import MappingProxyType
+from typing import Dict, FrozenSet, Iterable, List, Mapping, Optional, Tuple
+
+from rest_flex_fields import WILDCARD_VALUES
+
+
+class ExpansionGraph(object):
+    """
+    Edges map an expandable field name to the flex serializer class it
+    expands to, or to None for expansions that can't be expanded further
+    (serializer method fields, non-flex serializers...).
+    """
+
+    def __init__(self):
+        self._edges: Dict[type, Tuple[dict, Mapping[str, Optional[type]]]] = {}
+        self._reachable: Dict[type, FrozenSet[type]] = {}
+        self._max_depth: Dict[type, Optional[int]] = {}
+
+    def compile(self, serializer_classes: Iterable[type]) -> None:
+        """
+        Computes the edges, reachability and max depth of these classes.
+        """
+        for serializer_class in serializer_classes:
+            self.reachable(serializer_class)
+            self.max_depth(serializer_class)
+
+    def edges(self, serializer_class: type) -> Mapping[str, Optional[type]]:
+        expandable_fields = serializer_class._get_class_expandable_fields()
+        cached = self._edges.get(serializer_class)
+
+        if cached is not None and cached[0] is expandable_fields:
+            return cached[1]
+
+        edges = {}
+
+        for name, field_options in expandable_fields.items():
+            target = serializer_class._get_frozen_expandable_field(
+                name, field_options
+            )[0]
+            edges[name] = target if _is_flex_serializer_class(target) else None
+
+        edges = MappingProxyType(edges)
+
+        if cached is not None:
+            # The class's expandable fields changed; derived data is stale.
+            self._reachable.clear()
+            self._max_depth.clear()
+
+        self._edges[serializer_class] = (expandable_fields, edges)
+        return edges
+
+    def reachable(self, serializer_class: type) -> FrozenSet[type]:
+        """
+        Returns the serializer classes that can be reached from this one
+        through one or more expansions.
+        """
+        reachable = self._reachable.get(serializer_class)
+
+        if reachable is None:
+            accum = set()
+            pending = [serializer_class]
+
+            while pending:
+                for target in self.edges(pending.pop()).values():
+                    if target is not None and target not in accum:
+                        accum.add(target)
+                        pending.append(target)
+
+            reachable = frozenset(accum)
+            self._reachable[serializer_class] = reachable
+
+        return reachable
+
+    def max_depth(self, serializer_class: type) -> Optional[int]:
+        """
+        Returns the length of the longest expand path from this class, or
+        None if it's unbounded because the class can reach a cycle.
+        """
+        return self._compute_max_depth(serializer_class, ())
+
+    def _compute_max_depth(self, serializer_class: type, path: tuple) -> Optional[int]:
+        if serializer_class in path:
+            return None
+
+        if serializer_class in self._max_depth:
+            return self._max_depth[serializer_class]
+
+        depth = 0
+
+        for target in self.edges(serializer_class).values():
+            if target is None:
+                depth = max(depth, 1)
+                continue
+
+            nested = self._compute_max_depth(target, path + (serializer_class,))
+
+            if nested is None:
+                # Anything that reaches a cycle has no max depth, whichever
+                # path it was reached from, so this can be cached too.
+                depth = None
+                break
+
+            depth = max(depth, nested + 1)
+
+        self._max_depth[serializer_class] = depth
+        return depth
+
+    def check_path(
+        self,
+        serializer_class: type,
+        path: str,
+        max_depth: Optional[int] = None,
+        recursive_permitted: bool = True,
+    ) -> Optional[str]:
+        """
+        Returns why an expand path is invalid from this class, or None if
+        it's valid. Wildcards are valid at any level. Depth and recursion are
+        checked as in FlexFieldsSerializerMixin's validation.
+        """
+        names = path.split(".")
+
+        if max_depth is not None and len(names) > max_depth:
+            return "expansion depth exceeded"
+
+        if not recursive_permitted and len(set(names)) != len(names):
+            return "recursive expansion"
+
+        current = serializer_class
+
+        for position, name in enumerate(names):
+            if WILDCARD_VALUES is not None and name in WILDCARD_VALUES:
+                return None
+
+            if current is None:
+                return "'%s' can't be expanded further" % names[position - 1]
+
+            edges = self.edges(current)
+
+            if name not in edges:
+                return "unknown expandable field '%s'" % name
+
+            current = edges[name]
+
+        return None
+
+    def split_paths(
+        self,
+        serializer_class: type,
+        paths: Iterable[str],
+        max_depth: Optional[int] = None,
+        recursive_permitted: bool = True,
+    ) -> Tuple[List[str], Dict[str, str]]:
+        """
+        Returns the valid paths, and the reason for each invalid path.
+        """
+        valid, invalid = [], {}
+
+        for path in paths:
+            reason = self.check_path(
+                serializer_class, path, max_depth, recursive_permitted
+            )
+
+            if reason is None:
+                valid.append(path)
+            else:
+                invalid[path] = reason
+
+        return valid, invalid
+
+
+def _is_flex_serializer_class(target) -> bool:
+    from rest_flex_fields.serializers import FlexFieldsSerializerMixin
+
+    return isinstance(target, type) and issubclass(target, FlexFieldsSerializerMixin)
+
+
+_graph = ExpansionGraph()
+
+
+def get_expansion_graph() -> ExpansionGraph:
+    return _graph
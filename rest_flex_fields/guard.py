@@ -0,0 +1,246 @@
+"""
+A runtime guard against per-row queries and deferred field loads while flex
+serializers render.
+
+When FlexFieldsFilterBackend prunes a column with `only()` and a method field
+or property reads it anyway, Django loads it with one query per row; a
+missing prefetch does the same for relations. While a guard is active, every
+query and deferred field load that happens during flex serialization is
+counted against the path being rendered, e.g. "owner" or "pets.toys", and
+the guard warns, logs or raises once a path crosses its threshold:
+
+    with FlexFieldsGuard(action="raise"):
+        data = PetSerializer(pets, many=True, expand=["owner"]).data
+
+or, for every request, with FlexFieldsGuardMiddleware. Queries made outside
+of serialization, e.g. the view's own queryset, aren't counted. Paths are
+tracked per field for serializers rendered with compiled representation
+steps, and per serializer otherwise.
+"""
+import logging
+import threading
+import warnings
+from contextlib import ExitStack
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+
+from django.db import connections
+from django.db.models.query_utils import DeferredAttribute
+
+from rest_flex_fields import GUARD_ACTION, GUARD_MAX_DEFERRED_LOADS, GUARD_MAX_QUERIES
+from rest_flex_fields.tracing import get_serializer_path
+
+logger = logging.getLogger(__name__)
+
+
+class GuardError(Exception):
+    """
+    Raised by a FlexFieldsGuard whose action is "raise".
+    """
+
+
+class GuardWarning(RuntimeWarning):
+    """
+    Issued by a FlexFieldsGuard whose action is "warn".
+    """
+
+
+_DEFAULT = object()
+
+_active_guard: ContextVar[Optional["FlexFieldsGuard"]] = ContextVar(
+    "flex_fields_guard", default=None
+)
+# The dotted path being rendered, "" for the root serializer, or None outside
+# of flex serialization.
+_current_path: ContextVar[Optional[str]] = ContextVar(
+    "flex_fields_guard_path", default=None
+)
+
+
+class FlexFieldsGuard(object):
+    """
+    Counts the queries and deferred field loads per rendered path while
+    active. Thresholds and the action default to the GUARD_MAX_QUERIES,
+    GUARD_MAX_DEFERRED_LOADS and GUARD_ACTION settings; a threshold of None
+    disables that check, so the guard only counts. Each path is reported
+    once, and the reports are kept in `violations`.
+    """
+
+    def __init__(
+        self,
+        max_queries: Optional[int] = _DEFAULT,
+        max_deferred_loads: Optional[int] = _DEFAULT,
+        action: Optional[str] = None,
+    ):
+        self.max_queries = (
+            GUARD_MAX_QUERIES if max_queries is _DEFAULT else max_queries
+        )
+        self.max_deferred_loads = (
+            GUARD_MAX_DEFERRED_LOADS
+            if max_deferred_loads is _DEFAULT
+            else max_deferred_loads
+        )
+        self.action = action or GUARD_ACTION
+
+        if self.action not in ("warn", "log", "raise"):
+            raise ValueError("'action' should be one of 'warn', 'log' or 'raise'")
+
+        self.queries: Dict[str, int] = {}
+        self.deferred_loads: Dict[Tuple[str, str], int] = {}
+        self.violations: List[str] = []
+        self._reported = set()
+        self._token = None
+        self._stack = None
+
+    def __enter__(self) -> "FlexFieldsGuard":
+        self._stack = ExitStack()
+        _install_deferred_load_hook()
+        self._stack.callback(_uninstall_deferred_load_hook)
+
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self._execute))
+
+        self._token = _active_guard.set(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        _active_guard.reset(self._token)
+        self._stack.close()
+        return False
+
+    def _execute(self, execute, sql, params, many, context):
+        path = _current_path.get()
+
+        if path is not None and _active_guard.get() is self:
+            count = self.queries[path] = self.queries.get(path, 0) + 1
+
+            if self.max_queries is not None and count > self.max_queries:
+                self._report(
+                    ("queries", path),
+                    "%d queries while rendering %s, e.g. %s"
+                    % (count, describe_path(path), sql),
+                )
+
+        return execute(sql, params, many, context)
+
+    def _count_deferred_load(self, instance, field) -> None:
+        path = _current_path.get()
+
+        if path is None:
+            return
+
+        key = (path, "%s.%s" % (type(instance).__name__, field.attname))
+        count = self.deferred_loads[key] = self.deferred_loads.get(key, 0) + 1
+
+        if self.max_deferred_loads is not None and count > self.max_deferred_loads:
+            self._report(
+                ("deferred",) + key,
+                "deferred field %s loaded %d times while rendering %s"
+                % (key[1], count, describe_path(path)),
+            )
+
+    def _report(self, key: tuple, message: str) -> None:
+        if key in self._reported:
+            return
+
+        self._reported.add(key)
+        self.violations.append(message)
+
+        if self.action == "raise":
+            raise GuardError(message)
+        elif self.action == "log":
+            logger.warning(message)
+        else:
+            warnings.warn(message, GuardWarning, stacklevel=2)
+
+
+class FlexFieldsGuardMiddleware(object):
+    """
+    Runs every request under a FlexFieldsGuard configured by the settings.
+    Streamed responses are rendered after the middleware returns, and so
+    aren't guarded.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with FlexFieldsGuard():
+            return self.get_response(request)
+
+
+def get_active_guard() -> Optional[FlexFieldsGuard]:
+    return _active_guard.get()
+
+
+def call_at_path(path: str, func: Callable, *args):
+    """
+    Calls `func(*args)`, counting what it does against `path`.
+    """
+    token = _current_path.set(path)
+
+    try:
+        return func(*args)
+    finally:
+        _current_path.reset(token)
+
+
+def guard_representation(serializer, render: Callable, data):
+    """
+    Calls `render(data)`, counting what it does against the path of
+    `serializer`.
+    """
+    return call_at_path(get_serializer_path(serializer), render, data)
+
+
+def describe_path(path: str) -> str:
+    return "'%s'" % path if path else "the root serializer"
+
+
+# The original DeferredAttribute.__get__, and the number of active guards,
+# while the hook is installed.
+_original_deferred_get = None
+_hook_users = 0
+_hook_lock = threading.Lock()
+
+
+def _install_deferred_load_hook() -> None:
+    """
+    Wraps DeferredAttribute.__get__, when the first guard enters, to report
+    loads of deferred fields to the active guard. The wrapper only looks up
+    a context variable when the field isn't loaded yet.
+    """
+    global _original_deferred_get, _hook_users
+
+    with _hook_lock:
+        _hook_users += 1
+
+        if _hook_users > 1:
+            return
+
+        original = _original_deferred_get = DeferredAttribute.__get__
+
+        def __get__(self, instance, cls=None):
+            if instance is not None and self.field.attname not in instance.__dict__:
+                guard = _active_guard.get()
+
+                if guard is not None:
+                    guard._count_deferred_load(instance, self.field)
+
+            return original(self, instance, cls)
+
+        DeferredAttribute.__get__ = __get__
+
+
+def _uninstall_deferred_load_hook() -> None:
+    """
+    Restores DeferredAttribute.__get__ when the last active guard exits.
+    """
+    global _original_deferred_get, _hook_users
+
+    with _hook_lock:
+        _hook_users -= 1
+
+        if _hook_users == 0:
+            DeferredAttribute.__get__ = _original_deferred_get
+            _original_deferred_get = None
@@ -0,0 +1,190 @@
+"""
+Batched resolution of computed expandable fields.
+
+A `BatchLoader` fetches the values for many instances in one call, and a
+`BatchedField` renders them:
+
+    class DietLoader(BatchLoader):
+        def load(self, keys, context):
+            return {diet.pet_id: diet.name for diet in Diet.objects.filter(pet_id__in=keys)}
+
+    class PetSerializer(FlexFieldsModelSerializer):
+        class Meta:
+            expandable_fields = {
+                "diet": (BatchedField, {"loader": DietLoader()}),
+            }
+
+Before a list is rendered, the keys of all of its rows are collected and
+loaded together, once per batched field and nesting level. Loaded values are
+cached per request.
+"""
+import copy
+from typing import Any, Dict, Hashable, Iterable, List, Mapping
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import models
+from rest_framework import serializers
+from rest_framework.fields import SkipField
+
+
+class BatchLoader(object):
+    """
+    Loads the values of a batched field. Subclasses implement `load`, and
+    may override `get_key` to batch on something other than the primary key.
+    """
+
+    def get_key(self, instance) -> Hashable:
+        return instance.pk
+
+    def load(self, keys: List[Hashable], context: dict) -> Mapping[Hashable, Any]:
+        """
+        Returns the values for `keys`; missing keys render as None.
+        """
+        raise NotImplementedError("BatchLoader subclasses must implement load()")
+
+    def __deepcopy__(self, memo):
+        # Loaders are shared configuration; copies of a field keep using the
+        # same loader, and so the same per-request cache.
+        return self
+
+
+class BatchedField(serializers.Field):
+    """
+    A read-only field whose value is fetched by `loader`, for every row of a
+    list at once. The loaded value is rendered by `child`, if passed, e.g.
+    a serializer, or returned as is.
+    """
+
+    def __init__(self, loader: BatchLoader, child=None, **kwargs):
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+        self.loader = loader
+        self.child = copy.deepcopy(child)
+
+        if self.child is not None:
+            self.child.bind(field_name="", parent=self)
+
+    def get_attribute(self, instance):
+        cache = self._get_loaded_values()
+        key = self.loader.get_key(instance)
+
+        if key not in cache:
+            self.prime([instance])
+
+        return cache[key]
+
+    def to_representation(self, value):
+        if self.child is None:
+            return value
+
+        return self.child.to_representation(value)
+
+    def prime(self, instances: Iterable) -> None:
+        """
+        Loads the values of all `instances` that aren't cached yet, in a
+        single call to the loader.
+        """
+        cache = self._get_loaded_values()
+        keys = {}
+
+        for instance in instances:
+            key = self.loader.get_key(instance)
+
+            if key not in cache:
+                keys[key] = None
+
+        if not keys:
+            return
+
+        loaded = self.loader.load(list(keys), self.context)
+
+        for key in keys:
+            cache[key] = loaded.get(key)
+
+    def _get_loaded_values(self) -> Dict[Hashable, Any]:
+        """
+        Returns this loader's cache, which lives on the request, or on the
+        root serializer when there isn't one.
+        """
+        holder = self.context.get("request") or self.root
+        caches = getattr(holder, "_flex_fields_batch_cache", None)
+
+        if caches is None:
+            caches = {}
+            setattr(holder, "_flex_fields_batch_cache", caches)
+
+        return caches.setdefault(self.loader, {})
+
+
+def prime_batched_fields(serializer, instances: Iterable) -> None:
+    """
+    Loads the batched fields of `serializer`, and of the serializers nested
+    in it, for all `instances`, with one loader call per field and level.
+    """
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+
+    instances = list(instances)
+
+    if not instances or not has_batched_fields(serializer):
+        return
+
+    for field in serializer._readable_fields:
+        if isinstance(field, BatchedField):
+            field.prime(instances)
+        elif _has_uncached_batched_fields(field):
+            prime_batched_fields(field, _get_nested_instances(field, instances))
+
+
+def has_batched_fields(field) -> bool:
+    """
+    Returns whether a serializer has batched fields at any level. Computed
+    once per serializer instance.
+    """
+    if isinstance(field, serializers.ListSerializer):
+        field = field.child
+
+    if not isinstance(field, serializers.Serializer):
+        return False
+
+    if "_flex_has_batched_fields" not in field.__dict__:
+        if hasattr(field, "_apply_flex_fields_for_representation"):
+            field._apply_flex_fields_for_representation()
+
+        field._flex_has_batched_fields = any(
+            isinstance(nested, BatchedField) or _has_uncached_batched_fields(nested)
+            for nested in field._readable_fields
+        )
+
+    return field._flex_has_batched_fields
+
+
+def _has_uncached_batched_fields(field) -> bool:
+    # Nested serializers with a fragment cache are skipped, so that cache
+    # hits don't build their fields; they load their own fields on a miss.
+    child = getattr(field, "child", field)
+
+    if getattr(child, "fragment_cache_version_field", None):
+        return False
+
+    return has_batched_fields(field)
+
+
+def _get_nested_instances(field, instances: List) -> List:
+    nested = []
+
+    for instance in instances:
+        try:
+            value = field.get_attribute(instance)
+        except (SkipField, ObjectDoesNotExist, AttributeError, KeyError):
+            continue
+
+        if value is None:
+            continue
+
+        if isinstance(field, serializers.ListSerializer):
+            nested.extend(value.all() if isinstance(value, models.Manager) else value)
+        else:
+            nested.append(value)
+
+    return nested
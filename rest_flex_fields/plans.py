@@ -0,0 +1,317 @@
+"""
+Compiled field-selection plans.
+
+A plan is the parsed form of the "expand", "fields" and "omit" options: the
+names that apply at the current level, plus a plan for every nested level.
+Plans are immutable and cached, so the root serializer and all of its nested
+serializers share the same plan objects instead of re-splitting dotted paths
+at every level.
+"""
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Iterable, List, Mapping, Tuple
+
+from rest_flex_fields import PLAN_CACHE_SIZE, WILDCARD_VALUES
+from rest_flex_fields.caching import LRUCache
+from rest_flex_fields.utils import split_levels
+
+
+class FlexPlan(object):
+    """
+    One level of a compiled plan. Attributes mirror the output of
+    `split_levels` for each option:
+
+    - `expand`, `fields`, `omit`: names that apply at this level
+    - `next_expand`, `next_fields`, `next_omit`: dotted remainders per name
+    - `child(name)`: the compiled plan for the nested level under a name
+
+    Child plans are compiled lazily, the first time a serializer asks for
+    them, so the depth of a requested path costs nothing beyond the levels
+    that actually exist.
+    """
+
+    __slots__ = (
+        "expand",
+        "fields",
+        "omit",
+        "next_expand",
+        "next_fields",
+        "next_omit",
+        "expand_all",
+        "include_all",
+        "key",
+        "_children",
+    )
+
+    def __init__(self, expand: Tuple[str], fields: Tuple[str], omit: Tuple[str]):
+        expand_fields, next_expand = split_levels(expand)
+        sparse_fields, next_sparse = split_levels(fields)
+        omit_fields, next_omit = split_levels(omit)
+
+        assign = super().__setattr__
+        assign("key", (expand, fields, omit))
+        assign("expand", tuple(dict.fromkeys(_first_levels(expand))))
+        assign("fields", frozenset(sparse_fields))
+        assign("omit", frozenset(omit_fields))
+        assign("next_expand", _freeze_levels(next_expand, keep_order=True))
+        assign("next_fields", _freeze_levels(next_sparse))
+        assign("next_omit", _freeze_levels(next_omit))
+        assign("expand_all", _contains_wildcard(expand_fields))
+        assign("include_all", _contains_wildcard(sparse_fields))
+        assign("_children", {})
+
+    def __setattr__(self, name, value):
+        raise AttributeError("FlexPlan instances are immutable")
+
+    def __repr__(self):
+        return "FlexPlan(expand=%r, fields=%r, omit=%r)" % self.key
+
+    @property
+    def is_empty(self) -> bool:
+        return not any(self.key)
+
+    def child(self, name: str) -> "FlexPlan":
+        """
+        Returns the plan for the nested level under `name`, which is empty
+        if no dotted paths continue through it.
+        """
+        child = self._children.get(name)
+
+        if child is None:
+            key = (
+                self.next_expand.get(name, ()),
+                self.next_fields.get(name, ()),
+                self.next_omit.get(name, ()),
+            )
+            child = _compile_plan(*key) if any(key) else EMPTY_PLAN
+            self._children[name] = child
+
+        return child
+
+
+class FieldIndex(object):
+    """
+    Maps the field and expandable field names of a serializer to bits, so
+    that the names a plan removes and expands are computed with a few
+    integer operations, once per plan.
+    """
+
+    __slots__ = (
+        "names",
+        "expandable_names",
+        "positions",
+        "field_mask",
+        "expandable_mask",
+        "_selections",
+    )
+
+    def __init__(self, field_names: Iterable[str], expandable_names: Iterable[str]):
+        field_names = tuple(field_names)
+        expandable_names = tuple(expandable_names)
+        self.expandable_names = expandable_names
+        self.names = field_names + tuple(
+            name for name in expandable_names if name not in field_names
+        )
+        self.positions = {name: 1 << i for i, name in enumerate(self.names)}
+        self.field_mask = self.mask(field_names)
+        self.expandable_mask = self.mask(expandable_names)
+        self._selections = LRUCache(PLAN_CACHE_SIZE)
+
+    def mask(self, names: Iterable[str]) -> int:
+        positions = self.positions
+        mask = 0
+
+        for name in names:
+            mask |= positions.get(name, 0)
+
+        return mask
+
+    def names_in(self, mask: int) -> List[str]:
+        return [name for name in self.names if self.positions[name] & mask]
+
+    def keep_mask(self, plan: FlexPlan) -> int:
+        """
+        Returns the bits of the names that `plan` doesn't remove. Names
+        with nested omits are kept, so that "omit=house.rooms" doesn't
+        omit the whole house.
+        """
+        omitted = self.mask(plan.omit) & ~self.mask(plan.next_omit)
+
+        if plan.include_all or not plan.fields:
+            return ~omitted
+
+        return self.mask(plan.fields) & ~omitted
+
+    def select(self, plan: FlexPlan) -> Tuple[Tuple[str], Tuple[str]]:
+        """
+        Returns the field names that `plan` removes, and the expandable
+        names it expands, in the order they are expanded.
+        """
+        selection = self._selections.get(plan.key)
+
+        if selection is None:
+            keep = self.keep_mask(plan)
+            expanded = self.expandable_mask & keep
+            candidates = self.expandable_names if plan.expand_all else plan.expand
+            selection = (
+                tuple(self.names_in(self.field_mask & ~keep)),
+                tuple(
+                    name
+                    for name in candidates
+                    if self.positions.get(name, 0) & expanded
+                ),
+            )
+            self._selections.set(plan.key, selection)
+
+        return selection
+
+
+class PermittedExpands(object):
+    """
+    A trie of the expand paths a view permits. A permitted path also permits
+    its prefixes, and a wildcard permits any name at its level, e.g.
+    "owner.*" permits "owner", "owner.employer" and "owner.pets", but not
+    "owner.pets.toys".
+    """
+
+    __slots__ = ("paths", "children")
+
+    def __init__(self, paths: Tuple[str]):
+        self.paths = paths
+        levels = {}
+
+        for path in paths:
+            name, _, rest = path.partition(".")
+            levels.setdefault(name, [])
+
+            if rest:
+                levels[name].append(rest)
+
+        # Paths permitted under a wildcard are permitted under every name.
+        for wildcard in [name for name in levels if _contains_wildcard((name,))]:
+            for name in levels:
+                if name != wildcard:
+                    levels[name].extend(levels[wildcard])
+
+        self.children = MappingProxyType(
+            {
+                name: PermittedExpands(tuple(sorted(set(rest))))
+                for name, rest in levels.items()
+            }
+        )
+
+    def __iter__(self):
+        return iter(self.paths)
+
+    def __repr__(self):
+        return "PermittedExpands(%r)" % (self.paths,)
+
+    def prune(self, expand: Iterable[str]) -> List[str]:
+        """
+        Returns the requested expand paths cut down to their longest
+        permitted prefix; paths with no permitted prefix are dropped. A
+        requested wildcard is replaced by the paths permitted at its level.
+        """
+        accum = {}
+
+        for path in expand:
+            for pruned in self._prune_path(path.split(".")):
+                accum[pruned] = None
+
+        return list(accum)
+
+    def _prune_path(self, names: List[str]) -> List[str]:
+        name = names[0]
+
+        if _contains_wildcard((name,)):
+            return list(self.paths)
+
+        node = self.children.get(name)
+
+        if node is None:
+            node = next(
+                (node for key, node in self.children.items() if _contains_wildcard((key,))),
+                None,
+            )
+
+        if node is None:
+            return []
+
+        if len(names) == 1:
+            return [name]
+
+        return [name + "." + rest for rest in node._prune_path(names[1:])] or [name]
+
+
+def compile_permitted_expands(paths: Iterable[str]) -> PermittedExpands:
+    """
+    Returns the shared, cached trie for a list of permitted expand paths.
+    """
+    return _compile_permitted_expands(normalize_option(paths))
+
+
+def compile_plan(expand=(), fields=(), omit=()) -> FlexPlan:
+    """
+    Returns the shared, cached plan for the passed options. Options may be
+    comma-separated strings or iterables of (possibly dotted) names.
+    """
+    return _compile_plan(
+        normalize_option(expand, keep_order=True),
+        normalize_option(fields),
+        normalize_option(omit),
+    )
+
+
+def normalize_option(values, keep_order: bool = False) -> Tuple[str]:
+    """
+    Converts an option value into the de-duplicated tuple used as the plan
+    cache key, so equivalent queries share a plan. Values are sorted unless
+    `keep_order` is set; expansions keep the order they were requested in,
+    which is the order expanded fields are rendered in.
+    """
+    if not values:
+        return ()
+
+    if isinstance(values, str):
+        values = [a.strip() for a in values.split(",") if a.strip()]
+
+    if keep_order:
+        return tuple(dict.fromkeys(values))
+
+    return tuple(sorted(set(values)))
+
+
+def clear_plan_cache() -> None:
+    _compile_plan.cache_clear()
+
+
+@lru_cache(maxsize=PLAN_CACHE_SIZE)
+def _compile_plan(expand: Tuple[str], fields: Tuple[str], omit: Tuple[str]):
+    return FlexPlan(expand, fields, omit)
+
+
+@lru_cache(maxsize=PLAN_CACHE_SIZE)
+def _compile_permitted_expands(paths: Tuple[str]) -> PermittedExpands:
+    return PermittedExpands(paths)
+
+
+def _freeze_levels(levels: dict, keep_order: bool = False) -> Mapping[str, Tuple[str]]:
+    return MappingProxyType(
+        {
+            name: tuple(dict.fromkeys(values) if keep_order else sorted(set(values)))
+            for name, values in levels.items()
+        }
+    )
+
+
+def _first_levels(paths: Iterable[str]) -> List[str]:
+    return [path.split(".", 1)[0] for path in paths]
+
+
+def _contains_wildcard(values: Iterable[str]) -> bool:
+    if WILDCARD_VALUES is None:
+        return False
+    return any(value in WILDCARD_VALUES for value in values)
+
+
+EMPTY_PLAN = _compile_plan((), (), ())
@@ -1,18 +1,54 @@
 import copy
+import hashlib
 import importlib
-from typing import List, Optional, Tuple
-
+import inspect
+from collections import OrderedDict
+from functools import partial
+from operator import attrgetter
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.exceptions import ImproperlyConfigured, ObjectDoesNotExist
+from django.db import models
+from django.utils.functional import cached_property
+from django.utils.module_loading import autodiscover_modules
 from rest_framework import serializers
+from rest_framework.fields import SkipField
+from rest_framework.relations import PKOnlyObject
 
 from rest_flex_fields import (
     EXPAND_PARAM,
     FIELDS_PARAM,
     OMIT_PARAM,
-    WILDCARD_VALUES,
     MAXIMUM_EXPANSION_DEPTH,
     RECURSIVE_EXPANSION_PERMITTED,
-    split_levels,
+    BUILD_ONLY_REQUESTED_FIELDS,
+    CACHE_FIELD_TEMPLATES,
+    FIELD_TEMPLATE_CACHE_SIZE,
+    FRAGMENT_CACHE,
+    FRAGMENT_CACHE_TIMEOUT,
+    INVALID_EXPAND_PATHS,
+)
+from rest_flex_fields.caching import LRUCache
+from rest_flex_fields.graph import get_expansion_graph
+from rest_flex_fields.guard import call_at_path, get_active_guard, guard_representation
+from rest_flex_fields.loaders import has_batched_fields, prime_batched_fields
+from rest_flex_fields.plans import (
+    FieldIndex,
+    FlexPlan,
+    PermittedExpands,
+    _contains_wildcard,
+    compile_permitted_expands,
+    compile_plan,
+)
+from rest_flex_fields.tracing import (
+    get_serializer_path,
+    get_tracer,
+    trace_representation,
 )
+from rest_flex_fields.utils import get_flex_param_values
 
 
 class FlexFieldsSerializerMixin(object):
@@ -26,6 +62,12 @@ class FlexFieldsSerializerMixin(object):
     expandable_fields = {}
     maximum_expansion_depth: Optional[int] = None
     recursive_expansion_permitted: Optional[bool] = None
+    build_only_requested_fields: Optional[bool] = None
+    cache_field_templates: Optional[bool] = None
+    fragment_cache_version_field: Optional[str] = None
+    fragment_cache: Optional[str] = None
+    fragment_cache_timeout: Optional[int] = None
+    invalid_expand_paths: Optional[str] = None
 
     def __init__(self, *args, **kwargs):
         expand = list(kwargs.pop(EXPAND_PARAM, []))
@@ -77,35 +119,365 @@ class FlexFieldsSerializerMixin(object):
         else:
             return RECURSIVE_EXPANSION_PERMITTED
 
+    def get_invalid_expand_paths(self) -> str:
+        """
+        Defined at serializer level or based on INVALID_EXPAND_PATHS setting
+        """
+        return self.invalid_expand_paths or INVALID_EXPAND_PATHS
+
+    def get_build_only_requested_fields(self) -> bool:
+        """
+        Defined at serializer level or based on BUILD_ONLY_REQUESTED_FIELDS setting
+        """
+        if self.build_only_requested_fields is not None:
+            return self.build_only_requested_fields
+        else:
+            return BUILD_ONLY_REQUESTED_FIELDS
+
+    def get_cache_field_templates(self) -> bool:
+        """
+        Defined at serializer level or based on CACHE_FIELD_TEMPLATES setting
+        """
+        if self.cache_field_templates is not None:
+            return self.cache_field_templates
+        else:
+            return CACHE_FIELD_TEMPLATES
+
+    def get_fragment_cache(self):
+        """
+        Defined at serializer level or based on FRAGMENT_CACHE setting
+        """
+        return caches[self.fragment_cache or FRAGMENT_CACHE or DEFAULT_CACHE_ALIAS]
+
+    def get_fragment_cache_timeout(self):
+        """
+        Defined at serializer level or based on FRAGMENT_CACHE_TIMEOUT setting
+        """
+        if self.fragment_cache_timeout is not None:
+            return self.fragment_cache_timeout
+        elif FRAGMENT_CACHE_TIMEOUT is not None:
+            return FRAGMENT_CACHE_TIMEOUT
+        else:
+            return DEFAULT_TIMEOUT
+
     def to_representation(self, instance):
+        if self.fragment_cache_version_field:
+            return self._represent_cached(instance, self._to_representation)
+
+        return self._to_representation(instance)
+
+    def _to_representation(self, instance):
+        self._apply_flex_fields_for_representation()
+
+        if self.parent is None:
+            prime_batched_fields(self, [instance])
+
+        if get_active_guard() is not None:
+            return guard_representation(
+                self,
+                partial(trace_representation, self, super().to_representation),
+                instance,
+            )
+
+        return trace_representation(self, super().to_representation, instance)
+
+    def _get_fragment_cache_key(self, instance) -> Optional[str]:
+        """
+        Returns the key of the cached representation of `instance`, or None
+        if fragment caching isn't enabled for this serializer. Keys combine
+        the serializer class with a digest of the flex options of this
+        subtree and the instance's primary key and version, so versions like
+        datetimes don't put spaces into keys.
+        """
+        if not self.fragment_cache_version_field:
+            return None
+
+        pk = getattr(instance, "pk", None)
+
+        if pk is None:
+            return None
+
+        prefix, plan_key = self._fragment_cache_key_parts
+        version = getattr(instance, self.fragment_cache_version_field)
+        digest = hashlib.md5(("%s:%r:%r" % (plan_key, pk, version)).encode())
+        return "%s:%s" % (prefix, digest.hexdigest())
+
+    def _represent_cached(self, instance, render: Callable):
+        """
+        Returns the cached representation of `instance`, or renders it with
+        `render` and caches it.
+        """
+        key = self._get_fragment_cache_key(instance)
+
+        if key is None:
+            return render(instance)
+
+        cache = self.get_fragment_cache()
+        data = cache.get(key)
+
+        if data is None:
+            data = render(instance)
+            cache.set(key, data, self.get_fragment_cache_timeout())
+
+        return data
+
+    def _represent_many_cached(self, instances: list, render_many: Callable) -> list:
+        """
+        Same as `_represent_cached` for a list of instances, with one cache
+        round trip to read and one to write. Misses are rendered together by
+        `render_many`.
+        """
+        keys = [self._get_fragment_cache_key(instance) for instance in instances]
+        cache = self.get_fragment_cache()
+        found = cache.get_many([key for key in keys if key is not None])
+        missing = [
+            instance for instance, key in zip(instances, keys) if key not in found
+        ]
+
+        if not missing:
+            return [found[key] for key in keys]
+
+        rendered = iter(render_many(missing))
+        accum = []
+        to_cache = {}
+
+        for key in keys:
+            if key in found:
+                accum.append(found[key])
+                continue
+
+            data = next(rendered)
+            accum.append(data)
+
+            if key is not None:
+                to_cache[key] = data
+
+        cache.set_many(to_cache, self.get_fragment_cache_timeout())
+        return accum
+
+    @cached_property
+    def _fragment_cache_key_parts(self) -> Tuple[str, str]:
+        plan = compile_plan(**self._flex_options_all)
+        cls = type(self)
+        return "flex_fields:%s.%s" % (cls.__module__, cls.__qualname__), repr(plan.key)
+
+    def _apply_flex_fields_for_representation(self):
         if not self._flex_fields_rep_applied:
             self.apply_flex_fields(self.fields, self._flex_options_rep_only)
             self._flex_fields_rep_applied = True
-        return super().to_representation(instance)
+
+    def _can_use_compiled_representation(self) -> bool:
+        """
+        Compiled representation reimplements Serializer.to_representation,
+        so it's only used when the class doesn't customize it.
+        """
+        return (
+            type(self).to_representation is FlexFieldsSerializerMixin.to_representation
+        )
+
+    def _represent_compiled(self, instance):
+        """
+        Equivalent of `to_representation` that runs the steps compiled for
+        the instance's class by `_compile_representation_steps`. Falls back
+        to the regular field lookup for a field whose fast getter fails.
+        """
+        steps = self._representation_steps.get(type(instance))
+
+        if steps is None:
+            self._apply_flex_fields_for_representation()
+            steps = self._compile_representation_steps(type(instance))
+            self._representation_steps[type(instance)] = steps
+
+        ret = {}
+
+        for field_name, getter, convert, field in steps:
+            if getter is None:
+                _represent_field(field, instance, ret)
+                continue
+
+            try:
+                value = getter(instance)
+            except ObjectDoesNotExist:
+                value = None
+            except (AttributeError, KeyError):
+                _represent_field(field, instance, ret)
+                continue
+
+            ret[field_name] = None if value is None else convert(value)
+
+        return ret
+
+    @cached_property
+    def _representation_steps(self) -> Dict[type, tuple]:
+        return {}
+
+    def _compile_representation_steps(self, instance_class: type) -> tuple:
+        """
+        Returns a tuple of (field name, attribute getter, converter, field)
+        steps for the readable fields. Fields whose attribute can be read
+        with a plain attribute lookup get a getter; the rest are left to
+        `_represent_field` (getter is None).
+        """
+        steps = []
+
+        for field in self._readable_fields:
+            getter = None
+            convert = field.to_representation
+
+            if self._is_simple_attribute(field, instance_class):
+                getter = attrgetter(field.source_attrs[0])
+
+                if isinstance(field, FlexFieldsSerializerMixin):
+                    if field._can_use_compiled_representation():
+                        convert = field._represent_compiled
+
+                        if field.fragment_cache_version_field:
+                            convert = partial(field._represent_cached, render=convert)
+
+                        if get_tracer().enabled:
+                            convert = partial(trace_representation, field, convert)
+
+            if get_active_guard() is not None:
+                path = get_serializer_path(field)
+                convert = partial(call_at_path, path, convert)
+
+                if getter is not None:
+                    getter = partial(call_at_path, path, getter)
+
+            steps.append((field.field_name, getter, convert, field))
+
+        return tuple(steps)
+
+    @staticmethod
+    def _is_simple_attribute(field: serializers.Field, instance_class: type) -> bool:
+        if issubclass(instance_class, Mapping):
+            return False
+
+        if type(field).get_attribute is not serializers.Field.get_attribute:
+            return False
+
+        if len(field.source_attrs) != 1:
+            return False
+
+        # Methods are called by DRF, so only plain attributes and
+        # descriptors (model fields, properties) are looked up directly.
+        class_attribute = inspect.getattr_static(
+            instance_class, field.source_attrs[0], None
+        )
+        return not callable(class_attribute)
 
     def get_fields(self):
-        fields = super().get_fields()
-        self.apply_flex_fields(fields, self._flex_options_base)
+        with get_tracer().span(
+            "flex.build_fields",
+            path=get_serializer_path(self),
+            serializer=type(self).__name__,
+        ):
+            fields = self._get_unbound_fields()
+
+            if self._can_push_down_representation_options():
+                self.apply_flex_fields(fields, self._flex_options_all)
+                self._flex_fields_rep_applied = True
+            else:
+                self.apply_flex_fields(fields, self._flex_options_base)
+
         return fields
 
+    def _get_unbound_fields(self) -> Dict[str, serializers.Field]:
+        """
+        Returns the fields built by the parent serializer class. With field
+        templates enabled, they are built once per class and set of build
+        options, and every instance gets cheap clones of the cached,
+        never-bound template fields.
+        """
+        if not self.get_cache_field_templates():
+            return super().get_fields()
+
+        templates = self._get_class_cache(
+            "_field_template_cache", partial(LRUCache, FIELD_TEMPLATE_CACHE_SIZE)
+        )
+        key = self._get_field_template_key()
+        template = templates.get(key)
+
+        if template is None:
+            template = super().get_fields()
+            templates.set(key, template)
+
+        return OrderedDict(
+            (name, _clone_field(field)) for name, field in template.items()
+        )
+
+    def _get_field_template_key(self) -> Optional[tuple]:
+        """
+        The built fields only depend on the build options when building only
+        requested fields; otherwise one template serves every instance.
+        """
+        if not self.get_build_only_requested_fields():
+            return None
+
+        plan = compile_plan(**self._get_field_build_options())
+        return plan.fields, plan.omit, frozenset(plan.next_omit)
+
+    def get_field_names(self, declared_fields, info):
+        """
+        When building only requested fields, drops the names that the flex
+        options would remove before ModelSerializer builds their fields.
+        """
+        field_names = super().get_field_names(declared_fields, info)
+
+        if not self.get_build_only_requested_fields():
+            return field_names
+
+        plan = compile_plan(**self._get_field_build_options())
+
+        if not plan.fields and not plan.omit:
+            return field_names
+
+        removed = self._select_fields(field_names, plan)[0]
+        return [name for name in field_names if name not in removed]
+
+    def _get_field_build_options(self) -> dict:
+        if self._can_push_down_representation_options():
+            return self._flex_options_all
+
+        return self._flex_options_base
+
+    def _can_push_down_representation_options(self) -> bool:
+        """
+        The options from query params only apply to the representation, so
+        they can only be applied while building the fields if nothing in
+        the serializer tree is validating input.
+        """
+        return self.get_build_only_requested_fields() and not hasattr(
+            self.root, "initial_data"
+        )
+
     def apply_flex_fields(self, fields, flex_options):
-        expand_fields, next_expand_fields = split_levels(flex_options["expand"])
-        sparse_fields, next_sparse_fields = split_levels(flex_options["fields"])
-        omit_fields, next_omit_fields = split_levels(flex_options["omit"])
+        plan = compile_plan(
+            flex_options["expand"], flex_options["fields"], flex_options["omit"]
+        )
+        return self.apply_flex_plan(fields, plan)
 
-        for field_name in self._get_fields_names_to_remove(
-            fields, omit_fields, sparse_fields, next_omit_fields
-        ):
+    def apply_flex_plan(self, fields, plan: FlexPlan):
+        """
+        Same as `apply_flex_fields`, but takes an already compiled plan.
+        """
+        names_to_remove, expanded_names = self._select_fields(fields, plan)
+
+        for field_name in names_to_remove:
             fields.pop(field_name)
 
-        for name in self._get_expanded_field_names(
-            expand_fields, omit_fields, sparse_fields, next_omit_fields
-        ):
+        for name in expanded_names:
             self.expanded_fields.append(name)
 
             fields[name] = self._make_expanded_field_serializer(
-                name, next_expand_fields, next_sparse_fields, next_omit_fields
+                name, plan.next_expand, plan.next_fields, plan.next_omit
             )
+            marker = self._get_frozen_expandable_field(
+                name, self._expandable_fields[name]
+            )[1].get("truncation_marker")
+
+            if marker:
+                fields[marker] = TruncationMarkerField(name)
 
         return fields
 
@@ -115,19 +487,10 @@ class FlexFieldsSerializerMixin(object):
         """
         Returns an instance of the dynamically created nested serializer.
         """
-        field_options = self._expandable_fields[name]
-
-        if isinstance(field_options, tuple):
-            serializer_class = field_options[0]
-            settings = copy.deepcopy(field_options[1]) if len(field_options) > 1 else {}
-        else:
-            serializer_class = field_options
-            settings = {}
-
-        if type(serializer_class) == str:
-            serializer_class = self._get_serializer_class_from_lazy_string(
-                serializer_class
-            )
+        serializer_class, frozen_settings = self._get_frozen_expandable_field(
+            name, self._expandable_fields[name]
+        )
+        settings = _copy_field_settings(frozen_settings)
 
         if issubclass(serializer_class, serializers.Serializer):
             settings["context"] = self.context
@@ -144,26 +507,190 @@ class FlexFieldsSerializerMixin(object):
             if name in nested_omit:
                 settings[OMIT_PARAM] = nested_omit[name]
 
-        return serializer_class(**settings)
+        limit = settings.pop("limit", None)
+        ordering = settings.pop("ordering", None)
+        settings.pop("truncation_marker", None)
+
+        if settings.get("many") and (limit is not None or ordering):
+            build = partial(
+                _make_bounded_list_serializer,
+                serializer_class,
+                limit=limit,
+                ordering=ordering,
+            )
+        else:
+            build = serializer_class
+
+        tracer = get_tracer()
+
+        if not tracer.enabled:
+            return build(**settings)
+
+        path = get_serializer_path(self)
+
+        with tracer.span(
+            "flex.expand",
+            path=path + "." + name if path else name,
+            serializer=serializer_class.__name__,
+        ):
+            return build(**settings)
+
+    def _select_fields(
+        self, field_names: Iterable[str], plan: FlexPlan
+    ) -> Tuple[Tuple[str], Tuple[str]]:
+        """
+        Returns the field names that `plan` removes, and the expandable
+        names it expands. The class's FieldIndex decides, unless a subclass
+        overrides `_get_fields_names_to_remove`, `_should_field_exist` or
+        `_get_expanded_field_names`, in which case those hooks do.
+        """
+        if not _overrides_selection_hooks(type(self)):
+            return self._get_field_index(field_names).select(plan)
+
+        omit_fields = list(plan.omit)
+        sparse_fields = list(plan.fields)
+        return (
+            tuple(
+                self._get_fields_names_to_remove(
+                    list(field_names), omit_fields, sparse_fields, plan.next_omit
+                )
+            ),
+            tuple(
+                self._get_expanded_field_names(
+                    list(plan.expand), omit_fields, sparse_fields, plan.next_omit
+                )
+            ),
+        )
+
+    def _get_field_index(self, field_names: Iterable[str]) -> FieldIndex:
+        """
+        Returns the index of these field names and the expandable fields,
+        shared by the instances of the class.
+        """
+        indexes = self._get_class_cache(
+            "_field_index_cache", partial(LRUCache, FIELD_TEMPLATE_CACHE_SIZE)
+        )
+        key = (tuple(field_names), tuple(self._expandable_fields))
+        index = indexes.get(key)
+
+        if index is None:
+            index = FieldIndex(*key)
+            indexes.set(key, index)
+
+        return index
+
+    @classmethod
+    def resolve_expandable_fields(cls) -> Dict[str, Any]:
+        """
+        Resolves every lazy string reference in the class's expandable
+        fields and caches the result, so expansion never has to import
+        anything at request time. Returns a mapping of field name to
+        serializer (or field) class, and raises ImproperlyConfigured for
+        references that cannot be imported.
+        """
+        resolved = {}
+
+        for name, field_options in cls._get_class_expandable_fields().items():
+            try:
+                resolved[name] = cls._get_frozen_expandable_field(
+                    name, field_options
+                )[0]
+            except ImproperlyConfigured:
+                raise
+            except Exception as e:
+                raise ImproperlyConfigured(
+                    "Could not resolve expandable field '%s' of %s: %s"
+                    % (name, cls.__name__, e)
+                )
+
+        return resolved
+
+    @classmethod
+    def _get_frozen_expandable_field(
+        cls, name: str, field_options
+    ) -> Tuple[Any, Mapping[str, Any]]:
+        """
+        Returns the resolved class and the read-only settings of an
+        expandable field. Both are computed once per class; the settings are
+        shared by every instance, so callers copy them before adding
+        per-instance keys.
+        """
+        cache = cls._get_class_cache("_frozen_expandable_field_cache")
+        cached = cache.get(name)
+
+        if cached is not None and cached[0] is field_options:
+            return cached[1]
+
+        if isinstance(field_options, tuple):
+            serializer_class = field_options[0]
+            settings = field_options[1] if len(field_options) > 1 else {}
+        else:
+            serializer_class = field_options
+            settings = {}
+
+        if not isinstance(settings, Mapping):
+            raise ImproperlyConfigured(
+                "Settings of expandable field '%s' of %s should be a dict"
+                % (name, cls.__name__)
+            )
+
+        if type(serializer_class) == str:
+            serializer_class = cls._resolve_lazy_serializer_class(serializer_class)
+
+        frozen = (serializer_class, MappingProxyType(dict(settings)))
+        cache[name] = (field_options, frozen)
+        return frozen
+
+    @classmethod
+    def _get_class_expandable_fields(cls) -> dict:
+        if hasattr(cls, "Meta") and hasattr(cls.Meta, "expandable_fields"):
+            return cls.Meta.expandable_fields
+
+        return cls.expandable_fields
+
+    @classmethod
+    def _get_class_cache(cls, attr_name: str, factory: Callable = dict):
+        """
+        Returns a cache stored in the class's own __dict__, so subclasses
+        don't share entries with their parents.
+        """
+        cache = cls.__dict__.get(attr_name)
+
+        if cache is None:
+            cache = factory()
+            setattr(cls, attr_name, cache)
+
+        return cache
 
     def _get_serializer_class_from_lazy_string(self, full_lazy_path: str):
+        return self._resolve_lazy_serializer_class(full_lazy_path)
+
+    @classmethod
+    def _resolve_lazy_serializer_class(cls, full_lazy_path: str):
+        cache = cls._get_class_cache("_lazy_serializer_class_cache")
+
+        if full_lazy_path in cache:
+            return cache[full_lazy_path]
+
         path_parts = full_lazy_path.split(".")
         class_name = path_parts.pop()
         path = ".".join(path_parts)
-        serializer_class, error = self._import_serializer_class(path, class_name)
+        serializer_class, error = cls._import_serializer_class(path, class_name)
 
         if error and not path.endswith(".serializers"):
-            serializer_class, error = self._import_serializer_class(
+            serializer_class, error = cls._import_serializer_class(
                 path + ".serializers", class_name
             )
 
         if serializer_class:
+            cache[full_lazy_path] = serializer_class
             return serializer_class
 
         raise Exception(error)
 
+    @staticmethod
     def _import_serializer_class(
-        self, path: str, class_name: str
+        path: str, class_name: str
     ) -> Tuple[Optional[str], Optional[str]]:
         try:
             module = importlib.import_module(path)
@@ -278,19 +805,30 @@ class FlexFieldsSerializerMixin(object):
         if not hasattr(self, "context") or not self.context.get("request"):
             return []
 
-        values = self.context["request"].query_params.getlist(field)
+        request = self.context["request"]
 
-        if not values:
-            values = self.context["request"].query_params.getlist(f"{field}[]")
+        with get_tracer().span(
+            "flex.parse", param=field, serializer=type(self).__name__
+        ):
+            values = get_flex_param_values(request, field)
+            validated = getattr(request, "_flex_fields_validated", None)
 
-        if values and len(values) == 1:
-            values = values[0].split(",")
+            if validated is None:
+                validated = set()
+                request._flex_fields_validated = validated
 
-        for expand_path in values:
-            self._validate_recursive_expansion(expand_path)
-            self._validate_expansion_depth(expand_path)
+            # Validation depends on the serializer's expansion settings, so
+            # it's done once per request and serializer class. Stripped
+            # expand paths are checked against the expansion graph instead.
+            if (type(self), field) not in validated:
+                if field != EXPAND_PARAM or self.get_invalid_expand_paths() != "strip":
+                    for expand_path in values:
+                        self._validate_recursive_expansion(expand_path)
+                        self._validate_expansion_depth(expand_path)
 
-        return values or []
+                validated.add((type(self), field))
+
+        return values
 
     def _split_expand_field(self, expand_path: str) -> List[str]:
         return expand_path.split(".")
@@ -344,26 +882,314 @@ class FlexFieldsSerializerMixin(object):
         """
         If a list of permitted_expands has been passed to context,
         make sure that the "expand" fields from the query params
-        comply.
+        comply. Paths are cut down to their longest permitted prefix.
         """
-        expand = self._get_query_param_value(expand_param)
+        expand = self._check_expand_paths(self._get_query_param_value(expand_param))
 
         if "permitted_expands" in self.context:
             permitted_expands = self.context["permitted_expands"]
 
-            if self._contains_wildcard_value(expand):
-                return permitted_expands
-            else:
-                return list(set(expand) & set(permitted_expands))
+            if not isinstance(permitted_expands, PermittedExpands):
+                permitted_expands = compile_permitted_expands(permitted_expands)
+
+            return permitted_expands.prune(expand)
 
         return expand
 
+    def invalid_expansion_path(self, expand_path: str, reason: str):
+        """
+        A customized exception can be raised when an expand path isn't in the expansion graph, default ValidationError
+        """
+        raise serializers.ValidationError(
+            detail="Invalid expansion '%s': %s" % (expand_path, reason)
+        )
+
+    def _check_expand_paths(self, expand: List[str]) -> List[str]:
+        """
+        Validates the requested expand paths against the expansion graph,
+        in one pass. Depending on INVALID_EXPAND_PATHS, invalid paths are
+        ignored (kept as is), rejected or stripped.
+        """
+        mode = self.get_invalid_expand_paths()
+
+        if mode == "ignore" or not expand:
+            return expand
+
+        # Per-instance expandable fields aren't part of the graph.
+        if self._expandable_fields is not type(self)._get_class_expandable_fields():
+            return expand
+
+        valid, invalid = get_expansion_graph().split_paths(
+            type(self),
+            expand,
+            max_depth=self.get_maximum_expansion_depth(),
+            recursive_permitted=self.get_recursive_expansion_permitted(),
+        )
+
+        if invalid and mode == "reject":
+            expand_path = next(iter(invalid))
+            self.invalid_expansion_path(expand_path, invalid[expand_path])
+
+        return valid
+
     def _contains_wildcard_value(self, expand_values: List[str]) -> bool:
-        if WILDCARD_VALUES is None:
+        return _contains_wildcard(expand_values)
+
+
+class FlexFieldsListSerializer(serializers.ListSerializer):
+    """
+    List serializer for flex serializers that applies the flex options once
+    and then renders every row with compiled representation steps, instead
+    of walking the child's fields generically per row. Batched fields are
+    loaded, and cached fragments read, for all rows at once. Enable it with:
+
+        class Meta:
+            list_serializer_class = FlexFieldsListSerializer
+    """
+
+    def __init__(self, *args, **kwargs):
+        # Set for bounded expansions, see the "limit" and "ordering"
+        # options of expandable fields.
+        self.limit: Optional[int] = kwargs.pop("limit", None)
+        self.ordering: Tuple[str] = tuple(kwargs.pop("ordering", None) or ())
+        super().__init__(*args, **kwargs)
+
+    def to_representation(self, data):
+        iterable = self.bound(data)
+
+        if not (
+            isinstance(self.child, FlexFieldsSerializerMixin)
+            and self.child._can_use_compiled_representation()
+        ):
+            return super().to_representation(self._prime(iterable))
+
+        if self.child.fragment_cache_version_field:
+            return self.child._represent_many_cached(
+                list(iterable), self._represent_compiled
+            )
+
+        return self._represent_compiled(iterable)
+
+    def get_bound_ordering(self) -> Tuple[str]:
+        """
+        Returns the ordering of bounded rows; the primary key by default, so
+        the first `limit` rows are deterministic.
+        """
+        if self.ordering or self.limit is None:
+            return self.ordering
+
+        return ("pk",)
+
+    def bound(self, data, limit: Optional[int] = None):
+        """
+        Returns the rows to render: the first `limit` rows in
+        `get_bound_ordering()`. Prefetched rows, which FlexFieldsFilterBackend
+        already bounds and orders per parent, are sliced; other querysets
+        are bounded in the query.
+        """
+        iterable = data.all() if isinstance(data, models.Manager) else data
+        limit = self.limit if limit is None else limit
+        ordering = self.get_bound_ordering()
+
+        if limit is None and not ordering:
+            return iterable
+
+        if isinstance(iterable, models.QuerySet) and iterable._result_cache is None:
+            if ordering:
+                iterable = iterable.order_by(*ordering)
+
+            return iterable if limit is None else iterable[:limit]
+
+        return list(iterable)[:limit]
+
+    def is_truncated(self, data) -> bool:
+        """
+        Returns whether `bound()` leaves out some of the rows of `data`.
+        """
+        if self.limit is None:
             return False
-        intersecting_values = list(set(expand_values) & set(WILDCARD_VALUES))
-        return len(intersecting_values) > 0
+
+        return len(self.bound(data, self.limit + 1)) > self.limit
+
+    def _prime(self, iterable):
+        if not has_batched_fields(self.child):
+            return iterable
+
+        iterable = list(iterable)
+        prime_batched_fields(self.child, iterable)
+        return iterable
+
+    def _represent_compiled(self, iterable) -> list:
+        iterable = self._prime(iterable)
+        self.child._apply_flex_fields_for_representation()
+        represent = self.child._represent_compiled
+
+        if get_active_guard() is not None:
+            represent = partial(
+                call_at_path, get_serializer_path(self.child), represent
+            )
+
+        if not get_tracer().enabled:
+            return [represent(item) for item in iterable]
+
+        iterable = list(iterable)
+        return trace_representation(
+            self,
+            lambda rows: [represent(item) for item in rows],
+            iterable,
+            rows=len(iterable),
+        )
 
 
 class FlexFieldsModelSerializer(FlexFieldsSerializerMixin, serializers.ModelSerializer):
     pass
+
+
+class TruncationMarkerField(serializers.Field):
+    """
+    Renders whether the bounded expansion `list_field_name` of the same
+    serializer left out rows. Added next to it when the expandable field
+    sets "truncation_marker".
+    """
+
+    def __init__(self, list_field_name: str, **kwargs):
+        kwargs["read_only"] = True
+        kwargs["source"] = "*"
+        super().__init__(**kwargs)
+        self.list_field_name = list_field_name
+
+    def to_representation(self, instance) -> bool:
+        list_field = self.parent.fields[self.list_field_name]
+
+        try:
+            data = list_field.get_attribute(instance)
+        except SkipField:
+            return False
+
+        return data is not None and list_field.is_truncated(data)
+
+
+_SELECTION_HOOKS = (
+    "_get_fields_names_to_remove",
+    "_should_field_exist",
+    "_get_expanded_field_names",
+)
+
+
+def _overrides_selection_hooks(serializer_class: type) -> bool:
+    return any(
+        getattr(serializer_class, name) is not getattr(FlexFieldsSerializerMixin, name)
+        for name in _SELECTION_HOOKS
+    )
+
+
+def _copy_field_settings(frozen_settings: Mapping) -> dict:
+    """
+    Returns a mutable copy of frozen expandable field settings. Plain values
+    are shared, but field and serializer instances, e.g. a ListField's
+    `child`, are bound to the field they're passed to, so each expansion
+    gets its own copy.
+    """
+    return {
+        key: copy.deepcopy(value) if isinstance(value, serializers.Field) else value
+        for key, value in frozen_settings.items()
+    }
+
+
+def _make_bounded_list_serializer(
+    serializer_class: type, limit: Optional[int], ordering, **kwargs
+) -> FlexFieldsListSerializer:
+    """
+    Same as `serializer_class(many=True, **kwargs)`, but always returns a
+    FlexFieldsListSerializer (or the class's subclass of it), which renders
+    at most `limit` rows in `ordering`.
+    """
+    kwargs.pop("many")
+    list_kwargs = {
+        key: value
+        for key, value in kwargs.items()
+        if key in serializers.LIST_SERIALIZER_KWARGS
+    }
+    meta = getattr(serializer_class, "Meta", None)
+    list_serializer_class = getattr(meta, "list_serializer_class", None)
+
+    if not (
+        isinstance(list_serializer_class, type)
+        and issubclass(list_serializer_class, FlexFieldsListSerializer)
+    ):
+        list_serializer_class = FlexFieldsListSerializer
+
+    kwargs.pop("allow_empty", None)
+
+    return list_serializer_class(
+        child=serializer_class(**kwargs), limit=limit, ordering=ordering, **list_kwargs
+    )
+
+
+def _clone_field(field: serializers.Field) -> serializers.Field:
+    """
+    Returns a copy of a template field that is safe to bind. Serializers and
+    fields that bind child fields at construction time are rebuilt through
+    DRF's __deepcopy__; everything else gets a shallow copy.
+    """
+    if isinstance(field, serializers.BaseSerializer) or any(
+        hasattr(field, name) for name in ("child", "child_relation")
+    ):
+        return copy.deepcopy(field)
+
+    return copy.copy(field)
+
+
+def _represent_field(field: serializers.Field, instance, ret: dict) -> None:
+    """
+    Adds the representation of a single field to `ret`, the same way
+    Serializer.to_representation does.
+    """
+    try:
+        attribute = field.get_attribute(instance)
+    except SkipField:
+        return
+
+    check_for_none = attribute.pk if isinstance(attribute, PKOnlyObject) else attribute
+
+    if check_for_none is None:
+        ret[field.field_name] = None
+    else:
+        ret[field.field_name] = field.to_representation(attribute)
+
+
+def get_flex_serializer_classes() -> List[type]:
+    """
+    Returns every imported subclass of FlexFieldsSerializerMixin.
+    """
+    accum = []
+    pending = list(FlexFieldsSerializerMixin.__subclasses__())
+
+    while pending:
+        serializer_class = pending.pop()
+
+        if serializer_class not in accum:
+            accum.append(serializer_class)
+            pending.extend(serializer_class.__subclasses__())
+
+    return accum
+
+
+def resolve_all_expandable_fields(autodiscover: bool = True) -> None:
+    """
+    Resolves the lazy expandable field references of all flex serializers,
+    failing fast with ImproperlyConfigured on the first bad path. Intended
+    to be called once at startup, e.g. from an AppConfig.ready hook, and
+    also compiles the expansion graph of these classes. When `autodiscover`
+    is set, the "serializers" module of every installed app is imported
+    first so that its classes are included.
+    """
+    if autodiscover:
+        autodiscover_modules("serializers")
+
+    serializer_classes = get_flex_serializer_classes()
+
+    for serializer_class in serializer_classes:
+        serializer_class.resolve_expandable_fields()
+
+    get_expansion_graph().compile(serializer_classes)
@@ -0,0 +1,146 @@
+"""
+Test helpers that check every expand path of a serializer for N+1 queries
+and deferred field loads:
+
+    class PetViewTests(FlexFieldsQueryTestMixin, APITestCase):
+        def seed(self, rows):
+            for _ in range(rows):
+                Pet.objects.create(owner=Person.objects.create(...), ...)
+
+        def test_expands_run_constant_queries(self):
+            self.assertListExpandsConstant(
+                reverse("pet-list"), PetSerializer, self.seed
+            )
+
+Each path is requested with N rows seeded, and again with 2N; a path whose
+query count grows with the number of rows is reported by name, as is any
+deferred field loaded while rendering it.
+"""
+from typing import Any, Callable, Iterable, List, Optional
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from rest_flex_fields import EXPAND_PARAM
+from rest_flex_fields.graph import get_expansion_graph
+from rest_flex_fields.guard import FlexFieldsGuard, describe_path
+
+
+def get_expand_paths(serializer_class: type, max_depth: Optional[int] = None) -> List[str]:
+    """
+    Returns every expand path of `serializer_class` from the expansion
+    graph, depth first, up to `max_depth` levels. Paths stop before
+    expanding a serializer class that is already on the path, so recursive
+    expansions are enumerated once.
+    """
+    graph = get_expansion_graph()
+    accum = []
+
+    def walk(current: type, prefix: str, depth: int, visited: tuple):
+        for name, target in sorted(graph.edges(current).items()):
+            path = prefix + name
+            accum.append(path)
+
+            if target is None or target in visited:
+                continue
+
+            if max_depth is not None and depth + 1 >= max_depth:
+                continue
+
+            walk(target, path + ".", depth + 1, visited + (target,))
+
+    walk(serializer_class, "", 0, (serializer_class,))
+    return accum
+
+
+def check_expand_queries(
+    fetch: Callable[[str], Any],
+    seed: Callable[[int], Any],
+    paths: Iterable[str],
+    rows: int = 5,
+) -> List[str]:
+    """
+    Seeds `rows` rows, calls `fetch(path)` for every path, seeds `rows`
+    more and calls it again. Returns a message for every path whose query
+    count grew, that loaded deferred fields while rendering, or whose
+    response failed; an empty list means every path passed.
+    """
+    paths = list(paths)
+    seed(rows)
+    first = {path: _measure(fetch, path) for path in paths}
+    seed(rows)
+    failures = []
+
+    for path in paths:
+        queries, deferred_loads, status_code = _measure(fetch, path)
+        label = "%s=%s" % (EXPAND_PARAM, path)
+
+        if status_code is not None and status_code >= 400:
+            failures.append("%s: response status %s" % (label, status_code))
+            continue
+
+        if queries > first[path][0]:
+            failures.append(
+                "%s: %d queries with %d rows, %d with %d rows"
+                % (label, first[path][0], rows, queries, rows * 2)
+            )
+
+        for (rendered_path, field), count in sorted(deferred_loads.items()):
+            failures.append(
+                "%s: deferred field %s loaded %d times while rendering %s"
+                % (label, field, count, describe_path(rendered_path))
+            )
+
+    return failures
+
+
+def _measure(fetch: Callable[[str], Any], path: str) -> tuple:
+    guard = FlexFieldsGuard(max_queries=None, max_deferred_loads=None)
+
+    with CaptureQueriesContext(connection) as context, guard:
+        response = fetch(path)
+
+    return (
+        len(context.captured_queries),
+        dict(guard.deferred_loads),
+        getattr(response, "status_code", None),
+    )
+
+
+class FlexFieldsQueryTestMixin(object):
+    """
+    Assertions for TestCase subclasses; `assertListExpandsConstant` uses
+    the test client.
+    """
+
+    def assertExpandQueriesConstant(
+        self,
+        fetch: Callable[[str], Any],
+        seed: Callable[[int], Any],
+        paths: Iterable[str],
+        rows: int = 5,
+    ):
+        failures = check_expand_queries(fetch, seed, paths, rows)
+
+        if failures:
+            self.fail("\n".join(["N+1 expansions found:"] + failures))
+
+    def assertListExpandsConstant(
+        self,
+        url: str,
+        serializer_class: type,
+        seed: Callable[[int], Any],
+        rows: int = 5,
+        max_depth: Optional[int] = None,
+    ):
+        """
+        Checks the list at `url` without expansions, and with every expand
+        path of `serializer_class`.
+        """
+        paths = [""] + get_expand_paths(serializer_class, max_depth)
+        self.assertExpandQueriesConstant(
+            lambda path: self.client.get(url, {EXPAND_PARAM: path} if path else {}),
+            seed,
+            paths,
+            rows,
+        )
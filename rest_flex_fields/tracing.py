@@ -0,0 +1,235 @@
+"""
+Instrumentation hooks for flex serializers.
+
+Flex serializers report what they do to the active tracer as nested spans:
+
+- "flex.parse": parsing and validating a query param
+- "flex.build_fields": building (and expanding) the fields of a serializer
+- "flex.expand": constructing the serializer for one expanded field
+- "flex.filter_queryset": planning the queryset in FlexFieldsFilterBackend
+- "flex.serialize": rendering a root serializer; nested expanded paths are
+  reported as child spans carrying the number of rows rendered at that
+  path and their accumulated time in the "duration" attribute
+
+The default tracer does nothing. Set the `TRACER` setting to the dotted path
+of a `Tracer` subclass, or call `set_tracer()`, to collect spans, e.g. with
+`InMemoryTracer` in tests or an adapter for your tracing library.
+"""
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Dict, List, Optional
+
+from django.utils.module_loading import import_string
+
+from rest_flex_fields import TRACER
+
+
+class Span(object):
+    """
+    A span collected by InMemoryTracer.
+    """
+
+    def __init__(self, name: str, attributes: dict):
+        self.name = name
+        self.attributes = attributes
+        self.children: List["Span"] = []
+        self.start = perf_counter()
+        self.end: Optional[float] = None
+
+    def __repr__(self):
+        return "Span(%r, %r)" % (self.name, self.attributes)
+
+    def set_attribute(self, key: str, value) -> None:
+        self.attributes[key] = value
+
+    @property
+    def duration(self) -> float:
+        if "duration" in self.attributes:
+            return self.attributes["duration"]
+
+        return (self.end or perf_counter()) - self.start
+
+    def find(self, name: str) -> List["Span"]:
+        """
+        Returns all spans with this name in the tree, depth first.
+        """
+        accum = [self] if self.name == name else []
+
+        for child in self.children:
+            accum.extend(child.find(name))
+
+        return accum
+
+
+class _NoopSpan(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set_attribute(self, key: str, value) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Tracer(object):
+    """
+    Base tracer, which records nothing. Subclasses set `enabled` and return
+    a context manager from `span()` that yields an object with a
+    `set_attribute(key, value)` method.
+    """
+
+    enabled = False
+
+    def span(self, name: str, **attributes):
+        return _NOOP_SPAN
+
+
+class InMemoryTracer(Tracer):
+    """
+    Collects spans in memory as a tree, mostly useful in tests.
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self.spans: List[Span] = []
+        self._current: ContextVar[Optional[Span]] = ContextVar(
+            "flex_fields_current_span", default=None
+        )
+
+    def span(self, name: str, **attributes):
+        return _InMemorySpanContext(self, Span(name, attributes))
+
+    def find(self, name: str) -> List[Span]:
+        accum = []
+
+        for span in self.spans:
+            accum.extend(span.find(name))
+
+        return accum
+
+    def clear(self) -> None:
+        self.spans = []
+
+
+class _InMemorySpanContext(object):
+    def __init__(self, tracer: InMemoryTracer, span: Span):
+        self.tracer = tracer
+        self.span = span
+        self.token = None
+
+    def __enter__(self) -> Span:
+        parent = self.tracer._current.get()
+        (parent.children if parent else self.tracer.spans).append(self.span)
+        self.span.start = perf_counter()
+        self.token = self.tracer._current.set(self.span)
+        return self.span
+
+    def __exit__(self, *exc_info):
+        self.span.end = perf_counter()
+        self.tracer._current.reset(self.token)
+        return False
+
+
+_tracer: Optional[Tracer] = None
+
+
+def get_tracer() -> Tracer:
+    global _tracer
+
+    if _tracer is None:
+        _tracer = import_string(TRACER)() if TRACER else Tracer()
+
+    return _tracer
+
+
+def set_tracer(tracer: Optional[Tracer]) -> None:
+    """
+    Replaces the active tracer; `None` restores the one from settings.
+    """
+    global _tracer
+    _tracer = tracer
+
+
+# Rows and time accumulated per (path, serializer) while a root serializer
+# is rendering, so that nested serializers don't emit one span per row.
+_serialization_stats: ContextVar[Optional[Dict[tuple, list]]] = ContextVar(
+    "flex_fields_serialization_stats", default=None
+)
+
+
+def trace_representation(serializer, render, data, rows: int = 1):
+    """
+    Calls `render(data)` for `serializer`. The outermost call opens a
+    "flex.serialize" span; calls made while it's open are accumulated per
+    path and reported as child spans once rendering is done.
+    """
+    tracer = get_tracer()
+
+    if not tracer.enabled:
+        return render(data)
+
+    key = (get_serializer_path(serializer), type(serializer).__name__)
+    stats = _serialization_stats.get()
+
+    if stats is not None:
+        start = perf_counter()
+
+        try:
+            return render(data)
+        finally:
+            entry = stats.setdefault(key, [0, 0.0])
+            entry[0] += rows
+            entry[1] += perf_counter() - start
+
+    stats = {}
+    token = _serialization_stats.set(stats)
+
+    try:
+        with tracer.span(
+            "flex.serialize", path=key[0], serializer=key[1], rows=rows
+        ):
+            result = render(data)
+            _report_nested_stats(tracer, stats, key[0])
+    finally:
+        _serialization_stats.reset(token)
+
+    return result
+
+
+def _report_nested_stats(tracer: Tracer, stats: Dict[tuple, list], parent: str):
+    for (path, serializer_name), (rows, duration) in sorted(stats.items()):
+        if _parent_path(path) != parent:
+            continue
+
+        with tracer.span(
+            "flex.serialize",
+            path=path,
+            serializer=serializer_name,
+            rows=rows,
+            duration=duration,
+        ):
+            _report_nested_stats(tracer, stats, path)
+
+
+def _parent_path(path: str) -> str:
+    return path.rsplit(".", 1)[0] if "." in path else ""
+
+
+def get_serializer_path(field) -> str:
+    """
+    Returns the dotted path of a (bound) serializer or field from the root
+    serializer, skipping the unnamed children of list serializers.
+    """
+    names = []
+
+    while field is not None and getattr(field, "parent", None) is not None:
+        if field.field_name:
+            names.append(field.field_name)
+        field = field.parent
+
+    return ".".join(reversed(names))
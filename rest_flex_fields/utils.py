@@ -1,18 +1,27 @@
 from collections.abc import Iterable
+from typing import List
 
 from rest_flex_fields import EXPAND_PARAM, FIELDS_PARAM, OMIT_PARAM, WILDCARD_VALUES
 
 
 def is_expanded(request, field: str) -> bool:
     """ Examines request object to return boolean of whether
-        passed field is expanded.
+        passed field is expanded. A dotted field, e.g. "owner.employer",
+        is checked level by level; a plain name is expanded if it's
+        expanded at any level.
     """
-    expand_value = request.query_params.get(EXPAND_PARAM)
-    expand_fields = []
+    if "." in field:
+        plan = get_request_plan(request)
 
-    if expand_value:
-        for f in expand_value.split(","):
-            expand_fields.extend([_ for _ in f.split(".")])
+        for name in field.split("."):
+            if not plan.expand_all and name not in plan.expand:
+                return False
+
+            plan = plan.child(name)
+
+        return True
+
+    expand_fields = _get_flat_param_names(request, EXPAND_PARAM)
 
     return any(field for field in expand_fields if field in WILDCARD_VALUES) or field in expand_fields
 
@@ -21,19 +30,25 @@ def is_included(request, field: str) -> bool:
     """ Examines request object to return boolean of whether
         passed field has been excluded, either because `fields` is
         set, and it is not among them, or because `omit` is set and
-        it is among them.
+        it is among them. A dotted field, e.g. "owner.name", is checked
+        level by level; a plain name is checked against every level.
     """
-    sparse_value = request.query_params.get(FIELDS_PARAM)
-    omit_value = request.query_params.get(OMIT_PARAM)
-    sparse_fields, omit_fields = [], []
+    if "." in field:
+        plan = get_request_plan(request)
+
+        for name in field.split("."):
+            if plan.fields and not plan.include_all and name not in plan.fields:
+                return False
 
-    if sparse_value:
-        for f in sparse_value.split(","):
-            sparse_fields.extend([_ for _ in f.split(".")])
+            if name in plan.omit and name not in plan.next_omit:
+                return False
 
-    if omit_value:
-        for f in omit_value.split(","):
-            omit_fields.extend([_ for _ in f.split(".")])
+            plan = plan.child(name)
+
+        return True
+
+    sparse_fields = _get_flat_param_names(request, FIELDS_PARAM)
+    omit_fields = _get_flat_param_names(request, OMIT_PARAM)
 
     if len(sparse_fields) > 0 and field not in sparse_fields:
         return False
@@ -44,6 +59,90 @@ def is_included(request, field: str) -> bool:
     return True
 
 
+def get_request_plan(request):
+    """ Returns the compiled plan (see `rest_flex_fields.plans`) of the
+        request's "expand", "fields" and "omit" params: a tree with the
+        names requested at each level. It's compiled once per request.
+    """
+    plan = getattr(request, "_flex_fields_plan", None)
+
+    if plan is None:
+        from rest_flex_fields.plans import compile_plan
+
+        plan = compile_plan(
+            expand=get_flex_param_values(request, EXPAND_PARAM),
+            fields=get_flex_param_values(request, FIELDS_PARAM),
+            omit=get_flex_param_values(request, OMIT_PARAM),
+        )
+        request._flex_fields_plan = plan
+
+    return plan
+
+
+def get_flex_param_values(request, param: str) -> List[str]:
+    """ Returns the values of a flex query param, e.g. "expand", split
+        on commas. Each param is parsed once per request, and the result
+        is stored on the request for every serializer, filter backend and
+        helper that needs it.
+    """
+    parsed = getattr(request, "_flex_fields_params", None)
+
+    if parsed is None:
+        parsed = {}
+        request._flex_fields_params = parsed
+
+    if param not in parsed:
+        parsed[param] = tuple(_parse_param_values(request.query_params, param))
+
+    return list(parsed[param])
+
+
+def set_flex_param_values(request, param: str, values: List[str]) -> None:
+    """ Replaces the parsed values of a flex query param for the rest of
+        the request, e.g. to drop expansions before the serializers are
+        built.
+    """
+    get_flex_param_values(request, param)
+    request._flex_fields_params[param] = tuple(values)
+    request._flex_fields_plan = None
+    getattr(request, "_flex_fields_flat_params", {}).pop(param, None)
+
+
+def _get_flat_param_names(request, param: str) -> frozenset:
+    # The names of a param at every level, for the level-agnostic checks.
+    flat = getattr(request, "_flex_fields_flat_params", None)
+
+    if flat is None:
+        flat = {}
+        request._flex_fields_flat_params = flat
+
+    if param not in flat:
+        flat[param] = frozenset(
+            name
+            for value in get_flex_param_values(request, param)
+            for name in value.split(".")
+        )
+
+    return flat[param]
+
+
+def _parse_param_values(query_params, param: str) -> List[str]:
+    if hasattr(query_params, "getlist"):
+        values = query_params.getlist(param)
+
+        if not values:
+            values = query_params.getlist(f"{param}[]")
+    else:
+        # Plain mappings hold a single value per param.
+        value = query_params.get(param) or query_params.get(f"{param}[]")
+        values = [value] if value else []
+
+    if values and len(values) == 1:
+        values = values[0].split(",")
+
+    return values
+
+
 def split_levels(fields):
     """
         Convert dot-notation such as ['a', 'a.b', 'a.d', 'c'] into
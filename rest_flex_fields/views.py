@@ -2,22 +2,579 @@
     This class helps provide control over which fields can be expanded when a
     collection is request via the list method.
 """
+import hashlib
+from functools import update_wrapper
+from itertools import islice
+from typing import List, Optional, Tuple
 
-from rest_framework import viewsets
+from asgiref.sync import sync_to_async
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Count, Max, QuerySet, prefetch_related_objects
+from django.http import StreamingHttpResponse
+from django.utils.cache import parse_etags
+from rest_framework import mixins, serializers, status, viewsets
+from rest_framework.compat import LONG_SEPARATORS, SHORT_SEPARATORS
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from rest_flex_fields import (
+    EXPAND_PARAM,
+    EXPANSION_COST_ACTION,
+    EXPANSION_COST_BUDGET,
+    FIELDS_PARAM,
+    OMIT_PARAM,
+)
+from rest_flex_fields.aio import ASYNC_QUERYSETS, DEFAULT_CHUNK_SIZE, aserialize
+from rest_flex_fields.costs import estimate_expansion_cost
+from rest_flex_fields.filter_backends import FlexFieldsFilterBackend
+from rest_flex_fields.plans import (
+    FlexPlan,
+    PermittedExpands,
+    compile_permitted_expands,
+    compile_plan,
+)
+from rest_flex_fields.serializers import FlexFieldsSerializerMixin
+from rest_flex_fields.utils import get_flex_param_values, set_flex_param_values
 
 
 class FlexFieldsMixin(object):
     permit_list_expands = []
+    # When set, requests whose estimated expansion cost (see
+    # rest_flex_fields.costs) exceeds this budget are handled according to
+    # expansion_cost_action.
+    expansion_cost_budget: Optional[float] = None
+    expansion_cost_action: Optional[str] = None
+
+    def initial(self, request, *args, **kwargs):
+        super(FlexFieldsMixin, self).initial(request, *args, **kwargs)
+        self._validate_flex_params()
+
+    def get_expansion_cost_budget(self) -> Optional[float]:
+        """
+        Defined at view level or based on EXPANSION_COST_BUDGET setting
+        """
+        if self.expansion_cost_budget is not None:
+            return self.expansion_cost_budget
+        else:
+            return EXPANSION_COST_BUDGET
+
+    def get_expansion_cost_action(self) -> str:
+        """
+        Defined at view level or based on EXPANSION_COST_ACTION setting
+        """
+        return self.expansion_cost_action or EXPANSION_COST_ACTION
+
+    def _validate_flex_params(self):
+        """
+        Parses and validates the flex query params, which are then shared
+        through the request, before any queryset work starts. Constructing
+        the root serializer does this without building its fields. Only
+        reads by the list and retrieve actions (or views without actions)
+        are checked; other actions get their serializer as usual.
+        """
+        if self.request.method not in ("GET", "HEAD") or getattr(
+            self, "action", None
+        ) not in (None, "list", "retrieve"):
+            return
+
+        if issubclass(self.get_serializer_class(), FlexFieldsSerializerMixin):
+            self._admit_expansion_cost()
+            self.get_flex_serializer()
+
+    def expansion_cost_exceeded(self, cost: float, budget: float):
+        """
+        A customized exception can be raised when the expansion cost exceeds the budget, default ValidationError
+        """
+        raise serializers.ValidationError(
+            detail="Expansion cost exceeded (%g > %g)" % (cost, budget)
+        )
+
+    def _admit_expansion_cost(self) -> None:
+        """
+        Estimates the cost of the requested expansions, and if it exceeds
+        the budget, either rejects the request, drops the expansions (so
+        expandable fields render unexpanded) or caps the page size.
+        """
+        budget = self.get_expansion_cost_budget()
+
+        if budget is None:
+            return
+
+        request = self.request
+        expand = get_flex_param_values(request, EXPAND_PARAM)
+
+        if not expand:
+            return
+
+        if getattr(self, "action", None) == "list":
+            expand = self.get_permitted_list_expands().prune(expand)
+
+        serializer_class = self.get_serializer_class()
+        plan = compile_plan(
+            expand=expand,
+            fields=get_flex_param_values(request, FIELDS_PARAM),
+            omit=get_flex_param_values(request, OMIT_PARAM),
+        )
+        rows = self._get_expansion_cost_rows()
+        cost = estimate_expansion_cost(serializer_class, plan, rows)
+
+        if cost <= budget:
+            return
+
+        action = self.get_expansion_cost_action()
+
+        if action == "downgrade":
+            set_flex_param_values(request, EXPAND_PARAM, [])
+            return
+
+        if action == "paginate" and rows > 1 and self.paginator is not None:
+            max_rows = int(budget // estimate_expansion_cost(serializer_class, plan))
+
+            if max_rows >= 1:
+                self._cap_page_size(max_rows)
+                return
+
+        self.expansion_cost_exceeded(cost, budget)
+
+    def _get_expansion_cost_rows(self) -> int:
+        """
+        Returns the number of rows a list renders: the page size, or the
+        row count for unpaginated lists. Other actions render one.
+        """
+        if getattr(self, "action", None) != "list":
+            return 1
+
+        paginator = self.paginator
+
+        if paginator is not None:
+            get_size = getattr(paginator, "get_page_size", None) or getattr(
+                paginator, "get_limit", None
+            )
+            size = get_size(self.request) if get_size is not None else None
+
+            if size is not None:
+                return size
+
+        return self._get_unplanned_queryset(self.request).count()
+
+    def _cap_page_size(self, max_rows: int) -> None:
+        # The paginator belongs to this view instance, so its page size
+        # can be capped for this request only. Unpaginated limit/offset
+        # requests are paginated too.
+        paginator = self.paginator
+
+        for name in ("get_page_size", "get_limit"):
+            get_size = getattr(paginator, name, None)
+
+            if get_size is not None:
+                setattr(
+                    paginator,
+                    name,
+                    lambda request, get_size=get_size: min(
+                        get_size(request) or max_rows, max_rows
+                    ),
+                )
+
+    def get_flex_serializer(self):
+        """
+        Returns the root serializer of this request, without an instance.
+        FlexFieldsFilterBackend builds its fields to plan the queryset, and
+        the first `get_serializer()` call that renders instances reuses it,
+        so the expanded serializer tree is built once per request. It's
+        built through `get_serializer()`, so overrides that pass extra
+        options apply to the planned tree too.
+        """
+        serializer = getattr(self, "_flex_serializer", None)
+
+        if serializer is None:
+            self._building_flex_serializer = True
+
+            try:
+                serializer = self.get_serializer()
+            finally:
+                self._building_flex_serializer = False
+
+            self._flex_serializer = serializer
+            self._flex_serializer_reusable = True
+
+        return serializer
+
+    def get_serializer(self, *args, **kwargs):
+        if getattr(self, "_building_flex_serializer", False):
+            self._flex_serializer_kwargs = kwargs
+        elif self._can_reuse_flex_serializer(args, kwargs):
+            self._flex_serializer_reusable = False
+            serializer = self._flex_serializer
+
+            if not kwargs.get("many", False):
+                serializer.instance = args[0] if args else None
+                return serializer
+
+            meta = getattr(type(serializer), "Meta", None)
+            list_serializer_class = getattr(
+                meta, "list_serializer_class", serializers.ListSerializer
+            )
+            return list_serializer_class(
+                *args, child=serializer, context=serializer._context
+            )
+
+        return super(FlexFieldsMixin, self).get_serializer(*args, **kwargs)
+
+    def _can_reuse_flex_serializer(self, args: tuple, kwargs: dict) -> bool:
+        """
+        Only calls that render instances (an optional instance and `many`,
+        plus the options the root serializer was built with) reuse the root
+        serializer, once, if its class doesn't customize how it's wrapped in
+        a list serializer.
+        """
+        return (
+            getattr(self, "_flex_serializer_reusable", False)
+            and len(args) <= 1
+            and {k: v for k, v in kwargs.items() if k != "many"}
+            == self._flex_serializer_kwargs
+            and type(self._flex_serializer).many_init.__func__
+            is serializers.BaseSerializer.many_init.__func__
+        )
 
     def get_serializer_context(self):
         default_context = super(FlexFieldsMixin, self).get_serializer_context()
 
         if hasattr(self, "action") and self.action == "list":
-            default_context["permitted_expands"] = self.permit_list_expands
+            default_context["permitted_expands"] = self.get_permitted_list_expands()
 
         return default_context
 
+    def get_permitted_list_expands(self) -> PermittedExpands:
+        """
+        Returns `permit_list_expands` compiled into a trie, once per view
+        class.
+        """
+        view_class = type(self)
+        cached = view_class.__dict__.get("_flex_permitted_expands")
+
+        if cached is None or cached[0] is not self.permit_list_expands:
+            cached = (
+                self.permit_list_expands,
+                compile_permitted_expands(self.permit_list_expands),
+            )
+            view_class._flex_permitted_expands = cached
+
+        return cached[1]
+
+    # When set, list and retrieve responses get an ETag computed from the
+    # flex options and the count and max value of this field for the
+    # queryset and its expanded relations, and If-None-Match is answered
+    # with 304 before anything is serialized.
+    etag_version_field: Optional[str] = None
+
+    def _should_compute_etag(self, request) -> bool:
+        return bool(self.etag_version_field) and request.method in ("GET", "HEAD")
+
+    def _get_unplanned_queryset(self, request) -> QuerySet:
+        """
+        Returns the queryset filtered by every filter backend except
+        FlexFieldsFilterBackend, whose query planning isn't needed to
+        compute ETags and row counts.
+        """
+        queryset = self.get_queryset()
+
+        for backend in self.filter_backends:
+            if not issubclass(backend, FlexFieldsFilterBackend):
+                queryset = backend().filter_queryset(request, queryset, self)
+
+        return queryset
+
+    def _get_etag(self, request, queryset: QuerySet) -> Optional[str]:
+        """
+        Returns the ETag for serializing `queryset` with the request's flex
+        options: a digest of the normalized plan and the count and maximum
+        version of the rows and of each expanded relation, read with one
+        aggregate query per relation, so the joins of sibling to-many
+        relations don't multiply each other's rows. Only the root serializer
+        is constructed (to parse the options); no fields are built.
+        """
+        if not self._should_compute_etag(request):
+            return None
+
+        serializer = self.get_flex_serializer()
+        plan = compile_plan(**serializer._flex_options_all)
+        versions = {}
+
+        for index, (lookup, model) in enumerate(
+            [("", queryset.model)]
+            + get_expanded_relations(type(serializer), plan, queryset.model)
+        ):
+            prefix = lookup + "__" if lookup else ""
+            aggregates = {"count_%d" % index: Count(prefix + "pk", distinct=True)}
+
+            if _has_field(model, self.etag_version_field):
+                aggregates["version_%d" % index] = Max(
+                    prefix + self.etag_version_field
+                )
+
+            versions.update(queryset.order_by().aggregate(**aggregates))
+        digest = hashlib.md5(
+            repr(
+                (
+                    type(serializer).__name__,
+                    getattr(request.accepted_renderer, "format", None),
+                    plan.key,
+                    sorted(versions.items()),
+                )
+            ).encode()
+        ).hexdigest()
+        return '"%s"' % digest
+
+
+class FlexFieldsListModelMixin(mixins.ListModelMixin):
+    """
+    List action for views using FlexFieldsMixin, with conditional requests
+    (see `etag_version_field`) and streamed responses.
+    """
+
+    # When set, unpaginated JSON lists are streamed, loading this many rows
+    # at a time.
+    streaming_list_chunk_size: Optional[int] = None
+
+    def list(self, request, *args, **kwargs):
+        if not self._should_compute_etag(request):
+            return self._list(request, *args, **kwargs)
+
+        etag = self._get_etag(request, self._get_unplanned_queryset(request))
+
+        if _etag_matches(request, etag):
+            return _not_modified(etag)
+
+        return _set_etag(self._list(request, *args, **kwargs), etag)
+
+    def _list(self, request, *args, **kwargs):
+        if not self._should_stream_list(request):
+            return super(FlexFieldsListModelMixin, self).list(request, *args, **kwargs)
 
-class FlexFieldsModelViewSet(FlexFieldsMixin, viewsets.ModelViewSet):
+        queryset = self.filter_queryset(self.get_queryset())
+        serializer = self.get_serializer(many=True)
+
+        return StreamingHttpResponse(
+            self._stream_json_list(
+                queryset,
+                serializer,
+                request.accepted_renderer,
+                self.streaming_list_chunk_size,
+            ),
+            content_type=request.accepted_renderer.media_type,
+        )
+
+    def _should_stream_list(self, request) -> bool:
+        return (
+            bool(self.streaming_list_chunk_size)
+            and self.paginator is None
+            and isinstance(getattr(request, "accepted_renderer", None), JSONRenderer)
+        )
+
+    def _stream_json_list(self, queryset, serializer, renderer, chunk_size: int):
+        """
+        Yields the JSON array for `queryset` one chunk of rows at a time. The
+        queryset's prefetch lookups, e.g. those planned by
+        FlexFieldsFilterBackend, are applied to each chunk, since iterator()
+        doesn't apply them itself.
+        """
+        separators = SHORT_SEPARATORS if renderer.compact else LONG_SEPARATORS
+        encoder = renderer.encoder_class(
+            ensure_ascii=renderer.ensure_ascii,
+            allow_nan=not renderer.strict,
+            separators=separators,
+        )
+        lookups = queryset._prefetch_related_lookups
+        rows = queryset.prefetch_related(None).iterator(chunk_size=chunk_size)
+        separator = ""
+
+        yield "["
+
+        while True:
+            chunk = list(islice(rows, chunk_size))
+
+            if not chunk:
+                break
+
+            if lookups:
+                prefetch_related_objects(chunk, *lookups)
+
+            for row in serializer.to_representation(chunk):
+                yield separator + _escape_line_separators(encoder.encode(row))
+                separator = separators[0]
+
+        yield "]"
+
+
+
+class FlexFieldsRetrieveModelMixin(mixins.RetrieveModelMixin):
+    """
+    Retrieve action for views using FlexFieldsMixin, with conditional
+    requests (see `etag_version_field`).
+    """
+
+    def retrieve(self, request, *args, **kwargs):
+        if not self._should_compute_etag(request):
+            return super(FlexFieldsRetrieveModelMixin, self).retrieve(
+                request, *args, **kwargs
+            )
+
+        instance = self.get_object()
+        etag = self._get_etag(
+            request, instance._meta.model._base_manager.filter(pk=instance.pk)
+        )
+
+        if _etag_matches(request, etag):
+            return _not_modified(etag)
+
+        serializer = self.get_serializer(instance)
+        return _set_etag(Response(serializer.data), etag)
+
+
+def get_expanded_relations(
+    serializer_class, plan: FlexPlan, model, prefix: str = ""
+) -> List[Tuple[str, type]]:
+    """
+    Returns the (query lookup, related model) of each model relation that
+    `plan` expands, at any level, based on the serializer classes'
+    expandable fields. Expansions that aren't model relations are skipped.
+    """
+    expandable_fields = serializer_class._get_class_expandable_fields()
+    names = list(expandable_fields) if plan.expand_all else plan.expand
+    relations = []
+
+    for name in names:
+        if name not in expandable_fields:
+            continue
+
+        nested_class, settings = serializer_class._get_frozen_expandable_field(
+            name, expandable_fields[name]
+        )
+        model_field = FlexFieldsFilterBackend._get_field(
+            settings.get("source", name), model
+        )
+
+        if model_field is None or model_field.related_model is None:
+            continue
+
+        lookup = prefix + model_field.name
+        relations.append((lookup, model_field.related_model))
+
+        if isinstance(nested_class, type) and issubclass(
+            nested_class, FlexFieldsSerializerMixin
+        ):
+            relations.extend(
+                get_expanded_relations(
+                    nested_class,
+                    plan.child(name),
+                    model_field.related_model,
+                    lookup + "__",
+                )
+            )
+
+    return relations
+
+
+def _has_field(model, field_name: str) -> bool:
+    try:
+        model._meta.get_field(field_name)
+    except FieldDoesNotExist:
+        return False
+
+    return True
+
+
+def _etag_matches(request, etag: str) -> bool:
+    etags = parse_etags(request.META.get("HTTP_IF_NONE_MATCH", ""))
+    return etag in etags or "*" in etags
+
+
+def _not_modified(etag: str) -> Response:
+    return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+
+def _set_etag(response, etag: Optional[str]):
+    if etag is not None and response.status_code == status.HTTP_200_OK:
+        response["ETag"] = etag
+
+    return response
+
+
+def _escape_line_separators(content: str) -> str:
+    # Same as JSONRenderer, so the output stays a strict javascript subset.
+    return content.replace("\u2028", "\\u2028").replace("\u2029", "\\u2029")
+
+
+class AsyncFlexFieldsMixin(FlexFieldsMixin):
+    """
+    Serves the view as an async view on Django 4.1 and later. Requests are
+    still dispatched in a thread (authentication, permissions, queryset
+    planning), but unpaginated lists are then read with async queryset
+    iteration and serialized one chunk at a time, see
+    `rest_flex_fields.aio.aserialize`. On older versions, which can't read
+    querysets asynchronously, the view is served as a regular sync view.
+    """
+
+    async_list_chunk_size: int = DEFAULT_CHUNK_SIZE
+
+    @classmethod
+    def as_view(cls, *args, **initkwargs):
+        view = super(AsyncFlexFieldsMixin, cls).as_view(*args, **initkwargs)
+
+        if not ASYNC_QUERYSETS:
+            return view
+
+        dispatch = sync_to_async(view)
+
+        async def async_view(request, *args, **kwargs):
+            response = await dispatch(request, *args, **kwargs)
+            data = getattr(response, "data", None)
+
+            if isinstance(data, _DeferredListData):
+                response.data = await aserialize(data.serializer, data.chunk_size)
+
+            return response
+
+        return update_wrapper(async_view, view)
+
+    def _list(self, request, *args, **kwargs):
+        if (
+            not ASYNC_QUERYSETS
+            or self.paginator is not None
+            or self._should_stream_list(request)
+        ):
+            return super(AsyncFlexFieldsMixin, self)._list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        serializer = self.get_serializer(queryset, many=True)
+
+        return Response(_DeferredListData(serializer, self.async_list_chunk_size))
+
+
+class _DeferredListData(object):
+    """
+    Placeholder for the data of a list response, which the async view
+    replaces with the serialized rows.
+    """
+
+    def __init__(self, serializer, chunk_size: int):
+        self.serializer = serializer
+        self.chunk_size = chunk_size
+
+
+class FlexFieldsModelViewSet(
+    FlexFieldsMixin,
+    FlexFieldsListModelMixin,
+    FlexFieldsRetrieveModelMixin,
+    viewsets.ModelViewSet,
+):
     pass
 
+
+class AsyncFlexFieldsModelViewSet(
+    AsyncFlexFieldsMixin,
+    FlexFieldsListModelMixin,
+    FlexFieldsRetrieveModelMixin,
+    viewsets.ModelViewSet,
+):
+    pass
@@ -0,0 +1,9 @@
+from django.utils.datastructures import MultiValueDict
+
+
+class MockRequest(object):
+    def __init__(self, query_params=None, method="GET"):
+        if query_params is None:
+            query_params = MultiValueDict()
+        self.query_params = query_params
+        self.method = method
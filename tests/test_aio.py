@@ -0,0 +1,118 @@
+import asyncio
+
+from asgiref.sync import async_to_sync
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework import serializers
+from rest_framework.test import APIRequestFactory
+
+from rest_flex_fields import FlexFieldsModelSerializer
+from rest_flex_fields.aio import ASYNC_QUERYSETS, aiter_chunks, aserialize
+from rest_flex_fields.views import AsyncFlexFieldsModelViewSet
+from tests.testapp.models import Company, Person, Pet
+from tests.testapp.serializers import PersonWithPetsSerializer, PetSerializer
+
+
+class PetViewSet(AsyncFlexFieldsModelViewSet):
+    serializer_class = PetSerializer
+    queryset = Pet.objects.order_by("id")
+    permit_list_expands = ["owner"]
+
+
+class TestAsyncSerialization(TestCase):
+    def setUp(self):
+        company = Company.objects.create(name="McDonalds")
+
+        for name in ("Fred", "Bob", "Alice"):
+            person = Person.objects.create(
+                name=name, hobbies="sailing", employer=company
+            )
+            Pet.objects.create(
+                name=name + "'s cat", toys="string", species="cat", owner=person
+            )
+
+    def test_aiter_chunks_prefetches_each_chunk(self):
+        queryset = Person.objects.order_by("id").prefetch_related("pet_set")
+
+        async def collect():
+            return [chunk async for chunk in aiter_chunks(queryset, chunk_size=2)]
+
+        with CaptureQueriesContext(connection) as context:
+            chunks = async_to_sync(collect)()
+            pets = [[p.name for p in c.pet_set.all()] for chunk in chunks for c in chunk]
+
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 1])
+        self.assertEqual(pets, [["Fred's cat"], ["Bob's cat"], ["Alice's cat"]])
+        self.assertEqual(len(context.captured_queries), 3)
+
+    def test_aserialize_matches_sync_data(self):
+        queryset = Person.objects.order_by("id").prefetch_related("pet_set")
+        serializer = PersonWithPetsSerializer(queryset, many=True, expand=["pets"])
+        expected = PersonWithPetsSerializer(
+            queryset, many=True, expand=["pets"]
+        ).data
+
+        self.assertEqual(async_to_sync(aserialize)(serializer, chunk_size=2), expected)
+
+    def test_aserialize_renders_lazy_relations_in_a_thread(self):
+        serializer = PetSerializer(
+            Pet.objects.order_by("id"), many=True, expand=["owner"]
+        )
+
+        data = async_to_sync(aserialize)(serializer)
+
+        self.assertEqual(
+            [pet["owner"]["name"] for pet in data], ["Fred", "Bob", "Alice"]
+        )
+
+    def test_aserialize_renders_each_row_once_off_the_event_loop(self):
+        calls = []
+
+        class PetWithOwnerNameSerializer(FlexFieldsModelSerializer):
+            owner_name = serializers.SerializerMethodField()
+
+            class Meta:
+                model = Pet
+                fields = ["owner_name"]
+
+            def get_owner_name(self, obj):
+                try:
+                    asyncio.get_running_loop()
+                    calls.append("loop")
+                except RuntimeError:
+                    calls.append("thread")
+
+                return obj.owner.name
+
+        serializer = PetWithOwnerNameSerializer(
+            Pet.objects.order_by("id"), many=True
+        )
+
+        data = async_to_sync(aserialize)(serializer, chunk_size=2)
+
+        self.assertEqual(
+            [pet["owner_name"] for pet in data], ["Fred", "Bob", "Alice"]
+        )
+        self.assertEqual(calls, ["thread"] * 3)
+
+    def test_async_viewset_list(self):
+        view = PetViewSet.as_view({"get": "list"})
+        request = APIRequestFactory().get("/", {"expand": "owner", "fields": "owner"})
+
+        # Before Django 4.1 the viewset is served as a regular sync view.
+        self.assertEqual(asyncio.iscoroutinefunction(view), ASYNC_QUERYSETS)
+
+        if ASYNC_QUERYSETS:
+            view = async_to_sync(view)
+
+        response = view(request)
+
+        self.assertEqual(
+            response.data,
+            [
+                {"owner": {"name": name, "hobbies": "sailing"}}
+                for name in ("Fred", "Bob", "Alice")
+            ],
+        )
+        self.assertEqual(response.render().status_code, 200)
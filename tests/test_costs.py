@@ -0,0 +1,103 @@
+from django.test import TestCase
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.test import APIRequestFactory
+
+from rest_flex_fields.costs import estimate_expansion_cost
+from rest_flex_fields.plans import compile_plan
+from rest_flex_fields.views import FlexFieldsModelViewSet
+from tests.testapp.models import Company, Person, Pet
+from tests.testapp.serializers import PersonWithPetsSerializer, PetSerializer
+
+
+class WeightedPersonSerializer(PersonWithPetsSerializer):
+    expandable_field_weights = {"employer": 2}
+    expandable_field_fanouts = {"pets": 3}
+
+    class Meta(PersonWithPetsSerializer.Meta):
+        fields = ["id", "name"]
+        expandable_fields = {
+            "employer": "tests.testapp.serializers.CompanySerializer",
+            **PersonWithPetsSerializer.Meta.expandable_fields,
+        }
+
+
+class PersonViewSet(FlexFieldsModelViewSet):
+    serializer_class = WeightedPersonSerializer
+    queryset = Person.objects.order_by("id")
+    permit_list_expands = ["employer", "pets"]
+    expansion_cost_budget = 10
+
+
+class Pagination(PageNumberPagination):
+    page_size = 3
+
+
+class TestExpansionCost(TestCase):
+    def test_estimate(self):
+        self.assertEqual(estimate_expansion_cost(PetSerializer, compile_plan(), 10), 10)
+        self.assertEqual(
+            estimate_expansion_cost(
+                PetSerializer, compile_plan(expand=["owner.employer"]), 10
+            ),
+            30,
+        )
+        self.assertEqual(
+            estimate_expansion_cost(
+                PetSerializer,
+                compile_plan(expand=["owner.employer"], omit=["owner"]),
+                10,
+            ),
+            10,
+        )
+        self.assertEqual(
+            estimate_expansion_cost(
+                WeightedPersonSerializer, compile_plan(expand=["*"]), 2
+            ),
+            2 + 2 * 2 + 2 * 3,
+        )
+
+
+class TestExpansionCostAdmission(TestCase):
+    def setUp(self):
+        company = Company.objects.create(name="McDonalds")
+
+        for name in ("Fred", "Bob", "Alice"):
+            person = Person.objects.create(name=name, hobbies="", employer=company)
+            Pet.objects.create(name=name + "'s cat", toys="", species="", owner=person)
+
+    def _list(self, expand, **initkwargs):
+        view = PersonViewSet.as_view({"get": "list"}, **initkwargs)
+        return view(APIRequestFactory().get("/", {"expand": expand}))
+
+    def test_within_budget(self):
+        response = self._list("employer")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]["employer"]["name"], "McDonalds")
+
+    def test_reject(self):
+        response = self._list("pets")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, ["Expansion cost exceeded (12 > 10)"])
+
+    def test_downgrade(self):
+        response = self._list("pets", expansion_cost_action="downgrade")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.data[0]), ["id", "name"])
+
+    def test_paginate(self):
+        response = self._list(
+            "pets", expansion_cost_action="paginate", pagination_class=Pagination
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["count"], 3)
+        self.assertEqual(
+            [
+                [pet["name"] for pet in person["pets"]]
+                for person in response.data["results"]
+            ],
+            [["Fred's cat"], ["Bob's cat"]],
+        )
@@ -1,19 +1,14 @@
 from unittest import TestCase
 from unittest.mock import patch, PropertyMock
 
+from django.core.exceptions import ImproperlyConfigured
 from django.test import override_settings
 from django.utils.datastructures import MultiValueDict
 from rest_framework import serializers
 
 from rest_flex_fields import FlexFieldsModelSerializer
-
-
-class MockRequest(object):
-    def __init__(self, query_params=None, method="GET"):
-        if query_params is None:
-            query_params = MultiValueDict()
-        self.query_params = query_params
-        self.method = method
+from rest_flex_fields.serializers import FlexFieldsSerializerMixin
+from tests.helpers import MockRequest
 
 
 class TestFlexFieldModelSerializer(TestCase):
@@ -68,6 +63,27 @@ class TestFlexFieldModelSerializer(TestCase):
         )
         self.assertEqual(result, ["cat"])
 
+    def test_overridden_field_selection_hooks_are_used(self):
+        class CatSerializer(serializers.Serializer):
+            name = serializers.CharField()
+
+        class PetSerializer(FlexFieldsSerializerMixin, serializers.Serializer):
+            name = serializers.CharField()
+            species = serializers.CharField()
+            expandable_fields = {"cat": CatSerializer}
+
+            def _should_field_exist(self, field_name, *args):
+                # "name" can't be removed
+                return field_name == "name" or super()._should_field_exist(
+                    field_name, *args
+                )
+
+        fields = PetSerializer(fields=["species"]).fields
+        self.assertEqual(list(fields), ["name", "species"])
+
+        fields = PetSerializer(expand=["cat"], omit=["cat"]).fields
+        self.assertEqual(list(fields), ["name", "species"])
+
     def test_get_query_param_value_should_return_empty_if_not_root_serializer(self):
         serializer = FlexFieldsModelSerializer(
             context={
@@ -273,3 +289,49 @@ class TestFlexFieldModelSerializer(TestCase):
                     )
                 }
             )
+
+    def test_resolve_expandable_fields_caches_lazy_references(self):
+        from tests.testapp.serializers import (
+            PersonSerializer,
+            PetSerializer,
+            PetStoreSerializer,
+        )
+
+        resolved = PetSerializer.resolve_expandable_fields()
+
+        self.assertIs(resolved["owner"], PersonSerializer)
+        self.assertIs(resolved["sold_from"], PetStoreSerializer)
+        self.assertIs(resolved["diet"], serializers.SerializerMethodField)
+        self.assertIs(
+            PetSerializer._lazy_serializer_class_cache[
+                "tests.testapp.PersonSerializer"
+            ],
+            PersonSerializer,
+        )
+
+        with patch("importlib.import_module") as import_module:
+            PetSerializer(expand=["owner"]).fields
+            import_module.assert_not_called()
+
+    def test_resolve_expandable_fields_fails_fast_on_bad_path(self):
+        class BrokenSerializer(FlexFieldsModelSerializer):
+            class Meta:
+                expandable_fields = {"owner": "tests.testapp.MissingSerializer"}
+
+        with self.assertRaises(ImproperlyConfigured):
+            BrokenSerializer.resolve_expandable_fields()
+
+    def test_startup_resolution_is_opt_in(self):
+        from django.apps import apps
+
+        config = apps.get_app_config("rest_flex_fields")
+
+        with patch(
+            "rest_flex_fields.serializers.resolve_all_expandable_fields"
+        ) as resolve_all:
+            config.ready()
+            resolve_all.assert_not_called()
+
+            with patch("rest_flex_fields.RESOLVE_EXPANDABLE_FIELDS_ON_STARTUP", True):
+                config.ready()
+                resolve_all.assert_called_once_with()
@@ -0,0 +1,124 @@
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.utils.datastructures import MultiValueDict
+from rest_framework import serializers
+
+from rest_flex_fields import FlexFieldsModelSerializer
+from rest_flex_fields.graph import ExpansionGraph
+from tests.helpers import MockRequest
+from tests.testapp.models import Company, Person, Pet
+from tests.testapp.serializers import (
+    CompanySerializer,
+    PersonSerializer,
+    PetSerializer,
+)
+
+
+class PersonWithPetsSerializer(FlexFieldsModelSerializer):
+    class Meta:
+        model = Person
+        fields = ["name"]
+        expandable_fields = {
+            "pets": (
+                "tests.test_graph.PetWithOwnerSerializer",
+                {"many": True, "source": "pet_set"},
+            )
+        }
+
+
+class PetWithOwnerSerializer(FlexFieldsModelSerializer):
+    class Meta:
+        model = Pet
+        fields = ["name"]
+        expandable_fields = {"owner": PersonWithPetsSerializer}
+
+
+class TestExpansionGraph(TestCase):
+    def test_edges_reachability_and_max_depth(self):
+        graph = ExpansionGraph()
+        graph.compile([PetSerializer, PetWithOwnerSerializer])
+
+        self.assertEqual(
+            dict(graph.edges(PetSerializer)),
+            {"owner": PersonSerializer, "sold_from": None, "diet": None},
+        )
+        self.assertEqual(
+            graph.reachable(PetSerializer), {PersonSerializer, CompanySerializer}
+        )
+        self.assertEqual(graph.max_depth(PetSerializer), 2)
+        self.assertEqual(graph.max_depth(CompanySerializer), 0)
+        self.assertIsNone(graph.max_depth(PetWithOwnerSerializer))
+        self.assertIn(PetWithOwnerSerializer, graph.reachable(PetWithOwnerSerializer))
+
+    def test_check_path(self):
+        graph = ExpansionGraph()
+
+        self.assertIsNone(graph.check_path(PetSerializer, "owner.employer"))
+        self.assertIsNone(graph.check_path(PetSerializer, "owner.*"))
+        self.assertEqual(
+            graph.check_path(PetSerializer, "owner.pets"),
+            "unknown expandable field 'pets'",
+        )
+        self.assertEqual(
+            graph.check_path(PetSerializer, "diet.name"),
+            "'diet' can't be expanded further",
+        )
+        self.assertEqual(
+            graph.check_path(PetSerializer, "owner.employer", max_depth=1),
+            "expansion depth exceeded",
+        )
+        self.assertEqual(
+            graph.check_path(
+                PetWithOwnerSerializer, "owner.pets.owner", recursive_permitted=False
+            ),
+            "recursive expansion",
+        )
+
+
+class TestInvalidExpandPaths(TestCase):
+    def setUp(self):
+        company = Company.objects.create(name="McDonalds")
+        person = Person.objects.create(name="Fred", hobbies="sailing", employer=company)
+        self.pet = Pet.objects.create(
+            name="Garfield", toys="paper ball", species="cat", owner=person
+        )
+
+    def _serialize(self, expand):
+        request = MockRequest(query_params=MultiValueDict({"expand": [expand]}))
+        return PetSerializer(self.pet, context={"request": request}).data
+
+    def test_invalid_paths_are_ignored_by_default(self):
+        data = self._serialize("owner,owner.pets")
+
+        self.assertEqual(data["owner"]["name"], "Fred")
+
+    @patch.object(PetSerializer, "invalid_expand_paths", "reject")
+    def test_reject_invalid_paths(self):
+        with self.assertRaises(serializers.ValidationError) as context:
+            self._serialize("owner,owner.pets")
+
+        self.assertEqual(
+            str(context.exception.detail[0]),
+            "Invalid expansion 'owner.pets': unknown expandable field 'pets'",
+        )
+        self.assertEqual(self._serialize("owner")["owner"]["name"], "Fred")
+
+    @patch("rest_flex_fields.serializers.MAXIMUM_EXPANSION_DEPTH", 1)
+    @patch.object(PetSerializer, "invalid_expand_paths", "strip")
+    def test_strip_invalid_and_over_deep_paths(self):
+        serializer = PetSerializer(
+            self.pet,
+            context={
+                "request": MockRequest(
+                    query_params=MultiValueDict(
+                        {"expand": ["owner,owner.employer,sold_from.name,missing"]}
+                    )
+                )
+            },
+        )
+
+        self.assertEqual(serializer._flex_options_all["expand"], ["owner"])
+        self.assertEqual(
+            serializer.data["owner"], {"name": "Fred", "hobbies": "sailing"}
+        )
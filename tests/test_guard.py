@@ -0,0 +1,96 @@
+from django.db.models.query_utils import DeferredAttribute
+from django.test import RequestFactory, TestCase
+
+from rest_flex_fields import FlexFieldsModelSerializer
+from rest_flex_fields.guard import (
+    FlexFieldsGuard,
+    FlexFieldsGuardMiddleware,
+    GuardError,
+    GuardWarning,
+)
+from rest_flex_fields.serializers import FlexFieldsListSerializer
+from tests.testapp.models import Company, Person, Pet
+
+
+class PersonSerializer(FlexFieldsModelSerializer):
+    class Meta:
+        model = Person
+        fields = ["name"]
+
+
+class PetSerializer(FlexFieldsModelSerializer):
+    class Meta:
+        model = Pet
+        fields = ["name", "toys"]
+        list_serializer_class = FlexFieldsListSerializer
+        expandable_fields = {"owner": PersonSerializer}
+
+
+class TestGuard(TestCase):
+    def setUp(self):
+        company = Company.objects.create(name="McDonalds")
+
+        for name in ("Fred", "Bob", "Alice"):
+            person = Person.objects.create(name=name, hobbies="", employer=company)
+            Pet.objects.create(
+                name=name + "'s cat", toys="string", species="cat", owner=person
+            )
+
+    def test_deferred_field_load_raises_with_path(self):
+        pets = Pet.objects.only("id", "name")
+
+        with self.assertRaises(GuardError) as context:
+            with FlexFieldsGuard(action="raise"):
+                PetSerializer(pets, many=True).data
+
+        self.assertEqual(
+            str(context.exception),
+            "deferred field Pet.toys loaded 1 times while rendering 'toys'",
+        )
+
+    def test_deferred_load_hook_removed_when_last_guard_exits(self):
+        original = DeferredAttribute.__get__
+
+        with FlexFieldsGuard():
+            hooked = DeferredAttribute.__get__
+            self.assertIsNot(hooked, original)
+
+            with FlexFieldsGuard():
+                self.assertIs(DeferredAttribute.__get__, hooked)
+
+            self.assertIs(DeferredAttribute.__get__, hooked)
+
+        self.assertIs(DeferredAttribute.__get__, original)
+
+    def test_per_row_queries_of_expanded_path(self):
+        pets = list(Pet.objects.all())
+
+        with self.assertLogs("rest_flex_fields.guard") as logs:
+            with FlexFieldsGuard(max_queries=2, action="log") as guard:
+                PetSerializer(pets, many=True, expand=["owner"]).data
+
+        self.assertEqual(guard.queries, {"owner": 3})
+        self.assertEqual(len(logs.records), 1)
+        self.assertTrue(
+            logs.records[0].getMessage().startswith(
+                "3 queries while rendering 'owner', e.g. SELECT"
+            )
+        )
+
+    def test_planned_queryset_passes(self):
+        with FlexFieldsGuard(max_queries=0, action="raise") as guard:
+            pets = Pet.objects.select_related("owner")
+            data = PetSerializer(pets, many=True, expand=["owner"]).data
+
+        self.assertEqual(len(data), 3)
+        self.assertEqual(guard.queries, {})
+
+    def test_middleware(self):
+        def get_response(request):
+            PetSerializer(Pet.objects.only("id", "name"), many=True).data
+            return "response"
+
+        middleware = FlexFieldsGuardMiddleware(get_response)
+
+        with self.assertWarns(GuardWarning):
+            self.assertEqual(middleware(RequestFactory().get("/")), "response")
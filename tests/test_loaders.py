@@ -0,0 +1,124 @@
+from django.test import TestCase
+from django.utils.datastructures import MultiValueDict
+
+from rest_flex_fields import FlexFieldsModelSerializer
+from rest_flex_fields.loaders import BatchedField, BatchLoader
+from rest_flex_fields.serializers import FlexFieldsListSerializer
+from tests.helpers import MockRequest
+from tests.testapp.models import Company, Person, Pet
+from tests.testapp.serializers import PersonWithPetsSerializer
+
+
+class DietLoader(BatchLoader):
+    def __init__(self):
+        self.calls = []
+
+    def load(self, keys, context):
+        self.calls.append(sorted(keys))
+        return {pet.pk: pet.name + " food" for pet in Pet.objects.filter(pk__in=keys)}
+
+
+class OwnerLoader(BatchLoader):
+    def __init__(self):
+        self.calls = []
+
+    def get_key(self, instance):
+        return instance.owner_id
+
+    def load(self, keys, context):
+        self.calls.append(sorted(keys))
+        return Person.objects.in_bulk(keys)
+
+
+diet_loader = DietLoader()
+owner_loader = OwnerLoader()
+
+
+class PersonSerializer(FlexFieldsModelSerializer):
+    class Meta:
+        model = Person
+        fields = ["name"]
+
+
+class PetSerializer(FlexFieldsModelSerializer):
+    class Meta:
+        model = Pet
+        fields = ["name"]
+        list_serializer_class = FlexFieldsListSerializer
+        expandable_fields = {
+            "diet": (BatchedField, {"loader": diet_loader}),
+            "keeper": (
+                BatchedField,
+                {"loader": owner_loader, "child": PersonSerializer()},
+            ),
+        }
+
+
+class PersonWithBatchedPetsSerializer(PersonWithPetsSerializer):
+    class Meta(PersonWithPetsSerializer.Meta):
+        list_serializer_class = FlexFieldsListSerializer
+        expandable_fields = {
+            "pets": (PetSerializer, {"many": True, "source": "pet_set"})
+        }
+
+
+class TestBatchedFields(TestCase):
+    def setUp(self):
+        diet_loader.calls.clear()
+        owner_loader.calls.clear()
+        company = Company.objects.create(name="McDonalds")
+        self.people = []
+
+        for name in ("Fred", "Bob"):
+            person = Person.objects.create(
+                name=name, hobbies="sailing", employer=company
+            )
+            self.people.append(person)
+
+            for pet_name in ("cat", "dog"):
+                Pet.objects.create(
+                    name=name + "'s " + pet_name, toys="", species="", owner=person
+                )
+
+    def test_list_loads_all_rows_in_one_call(self):
+        pets = Pet.objects.order_by("id")
+        data = PetSerializer(pets, many=True, expand=["diet", "keeper"]).data
+
+        self.assertEqual(len(diet_loader.calls), 1)
+        self.assertEqual(len(diet_loader.calls[0]), 4)
+        self.assertEqual(owner_loader.calls, [[p.pk for p in self.people]])
+        self.assertEqual(data[0]["diet"], "Fred's cat food")
+        self.assertEqual(data[3]["keeper"], {"name": "Bob"})
+
+    def test_child_rendered_by_every_serializer(self):
+        pet = Pet.objects.order_by("id").first()
+
+        for _ in range(2):
+            data = PetSerializer(pet, expand=["keeper"]).data
+            self.assertEqual(data["keeper"], {"name": "Fred"})
+
+        child = PersonSerializer()
+        field = BatchedField(loader=owner_loader, child=child)
+
+        self.assertIsNot(field.child, child)
+        self.assertIsNone(child.parent)
+
+    def test_nested_level_loads_in_one_call(self):
+        people = Person.objects.order_by("id").prefetch_related("pet_set")
+        data = PersonWithBatchedPetsSerializer(people, many=True, expand=["pets.diet"]).data
+
+        self.assertEqual(len(diet_loader.calls), 1)
+        self.assertEqual(len(diet_loader.calls[0]), 4)
+        self.assertEqual(
+            [pet["diet"] for pet in data[1]["pets"]], ["Bob's cat food", "Bob's dog food"]
+        )
+
+    def test_single_root_and_request_cache(self):
+        pet = Pet.objects.order_by("id").first()
+        request = MockRequest(query_params=MultiValueDict({"expand": ["diet"]}))
+
+        for _ in range(2):
+            data = PetSerializer(pet, context={"request": request}).data
+            self.assertEqual(data["diet"], "Fred's cat food")
+
+        self.assertEqual(diet_loader.calls, [[pet.pk]])
@@ -0,0 +1,90 @@
+from django.test import TestCase
+
+from rest_flex_fields.plans import (
+    EMPTY_PLAN,
+    FieldIndex,
+    compile_permitted_expands,
+    compile_plan,
+)
+
+
+class TestPlans(TestCase):
+    def test_split_levels(self):
+        plan = compile_plan(
+            expand=["owner.employer", "sold_from"],
+            fields=["name", "owner.name"],
+            omit=["owner.employer.public"],
+        )
+
+        self.assertEqual(plan.expand, ("owner", "sold_from"))
+        self.assertEqual(plan.fields, {"name", "owner"})
+        self.assertEqual(plan.omit, {"owner"})
+        self.assertEqual(plan.next_expand, {"owner": ("employer",)})
+        self.assertEqual(plan.next_omit, {"owner": ("employer.public",)})
+
+    def test_equivalent_options_share_plan(self):
+        self.assertIs(
+            compile_plan(expand=["b", "a"], fields="x, y"),
+            compile_plan(expand=("b", "a", "b"), fields=["y", "x"]),
+        )
+
+    def test_expand_keeps_requested_order(self):
+        plan = compile_plan(expand=["zeta", "owner.pets", "alpha", "owner.employer"])
+
+        self.assertEqual(plan.expand, ("zeta", "owner", "alpha"))
+        self.assertEqual(plan.next_expand, {"owner": ("pets", "employer")})
+        self.assertIsNot(plan, compile_plan(expand=["alpha", "zeta", "owner"]))
+
+    def test_children_shared_with_nested_plans(self):
+        plan = compile_plan(expand=["owner.employer"], omit=["owner.name"])
+        child = plan.child("owner")
+
+        self.assertIs(child, compile_plan(expand=["employer"], omit=["name"]))
+        self.assertIs(child.child("employer"), EMPTY_PLAN)
+        self.assertIs(plan.child("sold_from"), EMPTY_PLAN)
+
+    def test_wildcards(self):
+        plan = compile_plan(expand=["~all"], fields=["*", "owner.name"])
+        self.assertTrue(plan.expand_all)
+        self.assertTrue(plan.include_all)
+        self.assertFalse(EMPTY_PLAN.expand_all)
+
+    def test_plans_are_immutable(self):
+        with self.assertRaises(AttributeError):
+            compile_plan(expand=["owner"]).expand = ()
+
+    def test_deep_paths_compile_lazily(self):
+        path = ".".join(["a"] * 400)
+        plan = compile_plan(fields=[path], omit=[path])
+
+        self.assertEqual(plan.fields, {"a"})
+        self.assertEqual(plan.child("a").next_fields, {"a": (".".join(["a"] * 398),)})
+
+    def test_field_index_selects_removed_and_expanded_names(self):
+        index = FieldIndex(["name", "owner", "toys"], ["owner", "diet"])
+        plan = compile_plan(
+            expand=["owner", "diet", "missing"],
+            fields=["name", "owner", "diet"],
+            omit=["owner.name"],
+        )
+
+        self.assertEqual(index.select(plan), (("toys",), ("owner", "diet")))
+        self.assertIs(index.select(plan), index.select(plan))
+        self.assertEqual(
+            index.select(compile_plan(expand=["*"], omit=["owner", "toys"])),
+            (("owner", "toys"), ("diet",)),
+        )
+
+    def test_permitted_expands_prune_to_longest_permitted_prefix(self):
+        permitted = compile_permitted_expands(["owner.*", "sold_from", "*.id"])
+
+        self.assertIs(permitted, compile_permitted_expands(["sold_from", "*.id", "owner.*"]))
+        self.assertEqual(
+            permitted.prune(
+                ["owner.employer.public", "sold_from.owner", "diet.id", "diet.name"]
+            ),
+            ["owner.employer", "sold_from", "diet.id", "diet"],
+        )
+        self.assertEqual(permitted.prune(["owner.*"]), ["owner.*", "owner.id"])
+        self.assertEqual(permitted.prune(["*"]), ["*.id", "owner.*", "sold_from"])
+        self.assertEqual(compile_permitted_expands(["owner"]).prune(["pets"]), [])
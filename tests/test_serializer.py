@@ -1,22 +1,18 @@
+import warnings
 from unittest.mock import patch
 
+from django.core.cache import caches
+from django.core.cache.backends.base import CacheKeyWarning
 from django.test import TestCase
 from django.utils.datastructures import MultiValueDict
 from rest_framework import serializers
 
 from rest_flex_fields.serializers import FlexFieldsModelSerializer
+from tests.helpers import MockRequest
 from tests.testapp.models import Company, Person, Pet
 from tests.testapp.serializers import PetSerializer
 
 
-class MockRequest(object):
-    def __init__(self, query_params=None, method="GET"):
-        if query_params is None:
-            query_params = {}
-        self.query_params = query_params
-        self.method = method
-
-
 class TestSerialize(TestCase):
     def test_basic_field_omit(self):
         pet = Pet(
@@ -282,3 +278,237 @@ class TestSerialize(TestCase):
         )
 
         serializer.is_valid(raise_exception=True)
+
+    def test_expanded_fields_render_in_requested_order(self):
+        class PetSerializer(FlexFieldsModelSerializer):
+            class Meta:
+                model = Pet
+                fields = ["name"]
+                expandable_fields = {
+                    "alpha": (serializers.CharField, {"source": "toys"}),
+                    "zeta": (serializers.CharField, {"source": "species"}),
+                }
+
+        pet = Pet(name="Garfield", toys="ball", species="cat")
+
+        self.assertEqual(
+            list(PetSerializer(pet, expand=["zeta", "alpha"]).data),
+            ["name", "zeta", "alpha"],
+        )
+        self.assertEqual(
+            list(PetSerializer(pet, expand=["alpha", "zeta"]).data),
+            ["name", "alpha", "zeta"],
+        )
+
+    def test_plain_expandable_field_settings_are_frozen_and_shared(self):
+        queryset = Person.objects.filter(name="Fred")
+
+        class PetWithOwnerSerializer(FlexFieldsModelSerializer):
+            class Meta:
+                model = Pet
+                fields = ["name"]
+                expandable_fields = {
+                    "owner": (
+                        serializers.PrimaryKeyRelatedField,
+                        {"queryset": queryset},
+                    )
+                }
+
+        first = PetWithOwnerSerializer(expand=["owner"]).fields["owner"]
+        second = PetWithOwnerSerializer(expand=["owner"]).fields["owner"]
+
+        self.assertIs(first.queryset, queryset)
+        self.assertIs(second.queryset, queryset)
+
+        _, settings = PetWithOwnerSerializer._get_frozen_expandable_field(
+            "owner", PetWithOwnerSerializer.Meta.expandable_fields["owner"]
+        )
+        self.assertEqual(dict(settings), {"queryset": queryset})
+
+        with self.assertRaises(TypeError):
+            settings["context"] = {}
+
+    def test_expandable_field_instances_copied_per_expansion(self):
+        child = serializers.CharField()
+
+        class PetWithTagsSerializer(FlexFieldsModelSerializer):
+            class Meta:
+                model = Pet
+                fields = ["name"]
+                expandable_fields = {
+                    "tags": (serializers.ListField, {"child": child, "source": "toys"})
+                }
+
+        pet = Pet(name="Garfield", toys="")
+        pet.toys = ["ball", "string"]
+
+        for _ in range(2):
+            serializer = PetWithTagsSerializer(pet, expand=["tags"])
+            self.assertEqual(serializer.data["tags"], ["ball", "string"])
+            self.assertIsNot(serializer.fields["tags"].child, child)
+
+        self.assertIsNone(child.parent)
+
+    def test_compiled_list_representation_matches_default(self):
+        from rest_flex_fields.serializers import FlexFieldsListSerializer
+
+        class CompiledPetSerializer(PetSerializer):
+            class Meta(PetSerializer.Meta):
+                list_serializer_class = FlexFieldsListSerializer
+
+        pets = [
+            Pet(
+                name=name,
+                toys="paper ball, string",
+                species="cat",
+                owner=Person(
+                    name="Fred", hobbies="sailing", employer=Company(name="McDonalds")
+                ),
+            )
+            for name in ("Garfield", "Odie")
+        ]
+
+        for options in (
+            {},
+            {"expand": ["owner.employer", "diet"]},
+            {"fields": ["name", "owner.name"], "expand": ["owner"]},
+            {"omit": ["toys", "owner.employer.public"], "expand": ["owner.employer"]},
+        ):
+            compiled = CompiledPetSerializer(pets, many=True, **options)
+            default = PetSerializer(pets, many=True, **options)
+
+            self.assertIsInstance(compiled, FlexFieldsListSerializer)
+            self.assertEqual(
+                [dict(row) for row in compiled.data], [dict(row) for row in default.data]
+            )
+
+    def test_compiled_list_representation_uses_custom_to_representation(self):
+        from rest_flex_fields.serializers import FlexFieldsListSerializer
+
+        class CustomPetSerializer(PetSerializer):
+            class Meta(PetSerializer.Meta):
+                list_serializer_class = FlexFieldsListSerializer
+
+            def to_representation(self, instance):
+                ret = super().to_representation(instance)
+                ret["custom"] = True
+                return ret
+
+        pet = Pet(name="Garfield", owner=Person(name="Fred"))
+        data = CustomPetSerializer([pet], many=True, fields=["name"]).data
+
+        self.assertEqual(data, [{"name": "Garfield", "custom": True}])
+
+    def test_build_only_requested_fields(self):
+        class SparsePetSerializer(PetSerializer):
+            build_only_requested_fields = True
+
+        pet = Pet(
+            name="Garfield",
+            toys="paper ball, string",
+            species="cat",
+            owner=Person(name="Fred", hobbies="sailing"),
+        )
+        request = MockRequest(
+            query_params=MultiValueDict({"fields": ["name,owner"], "expand": ["owner"]})
+        )
+
+        with patch.object(
+            SparsePetSerializer, "build_field", wraps=SparsePetSerializer().build_field
+        ) as build_field:
+            serializer = SparsePetSerializer(pet, context={"request": request})
+            data = serializer.data
+
+        self.assertEqual(data, {"name": "Garfield", "owner": {"name": "Fred", "hobbies": "sailing"}})
+        self.assertEqual([call[0][0] for call in build_field.call_args_list], ["name"])
+
+    def test_build_only_requested_fields_keeps_input_fields_when_validating(self):
+        class SparsePetSerializer(PetSerializer):
+            build_only_requested_fields = True
+
+        request = MockRequest(query_params=MultiValueDict({"fields": ["name"]}))
+        serializer = SparsePetSerializer(
+            data={"name": "Garfield", "toys": "ball", "species": "cat", "diet": "rats"},
+            context={"request": request},
+        )
+        serializer.is_valid()
+
+        self.assertIn("toys", serializer.fields)
+        self.assertIn("owner", serializer.errors)
+
+    def test_field_templates_are_built_once_and_cloned(self):
+        class CachedPetSerializer(PetSerializer):
+            cache_field_templates = True
+
+        pet = Pet(name="Garfield", owner=Person(name="Fred", hobbies="sailing"))
+
+        with patch.object(
+            CachedPetSerializer,
+            "build_field",
+            wraps=CachedPetSerializer().build_field,
+        ) as build_field:
+            first = CachedPetSerializer(pet, expand=["owner"])
+            second = CachedPetSerializer(pet, fields=["name", "owner"])
+            first_data, second_data = first.data, second.data
+
+        self.assertEqual(build_field.call_count, 3)
+        self.assertEqual(first_data["owner"], {"name": "Fred", "hobbies": "sailing"})
+        self.assertEqual(second_data, {"name": "Garfield", "owner": None})
+        self.assertIsNot(first.fields["name"], second.fields["name"])
+        self.assertIs(first.fields["name"].parent, first)
+        self.assertIs(second.fields["name"].parent, second)
+        self.assertIs(second.fields["owner"].parent, second)
+
+    def test_fragment_cache_reuses_representations_until_version_changes(self):
+        from rest_flex_fields.serializers import FlexFieldsListSerializer
+
+        class CachedCompanySerializer(FlexFieldsModelSerializer):
+            fragment_cache_version_field = "name"
+
+            class Meta:
+                model = Company
+                fields = ["name", "public"]
+                list_serializer_class = FlexFieldsListSerializer
+
+        class EmployeeSerializer(FlexFieldsModelSerializer):
+            class Meta:
+                model = Person
+                fields = ["name"]
+                list_serializer_class = FlexFieldsListSerializer
+                expandable_fields = {"employer": CachedCompanySerializer}
+
+        caches["default"].clear()
+        company = Company.objects.create(name="McDonalds")
+
+        for name in ("Fred", "Bob"):
+            Person.objects.create(name=name, hobbies="sailing", employer=company)
+
+        def serialize_people():
+            people = Person.objects.select_related("employer").order_by("id")
+            return EmployeeSerializer(people, many=True, expand=["employer"]).data
+
+        def serialize_companies():
+            companies = Company.objects.all()
+            return CachedCompanySerializer(companies, many=True).data
+
+        self.assertEqual(serialize_people()[1]["employer"]["public"], False)
+        self.assertEqual(serialize_companies()[0]["public"], False)
+
+        Company.objects.update(public=True)
+
+        with patch.object(
+            CachedCompanySerializer, "get_fields", side_effect=AssertionError
+        ):
+            self.assertEqual(serialize_people()[1]["employer"]["public"], False)
+            self.assertEqual(serialize_companies()[0]["public"], False)
+
+        Company.objects.update(name="Burger King")
+
+        with warnings.catch_warnings():
+            # Versions with spaces must still make portable keys.
+            warnings.simplefilter("error", CacheKeyWarning)
+            self.assertEqual(
+                serialize_people()[1]["employer"],
+                {"name": "Burger King", "public": True},
+            )
+            self.assertEqual(serialize_companies()[0]["public"], True)
@@ -0,0 +1,75 @@
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_flex_fields.filter_backends import FlexFieldsFilterBackend
+from rest_flex_fields.testing import (
+    FlexFieldsQueryTestMixin,
+    check_expand_queries,
+    get_expand_paths,
+)
+from tests.test_graph import PetWithOwnerSerializer
+from tests.testapp.models import Company, Person, Pet, PetStore
+from tests.testapp.serializers import PetSerializer
+
+
+class TestQueryTestHelpers(FlexFieldsQueryTestMixin, TestCase):
+    def seed(self, rows):
+        for i in range(rows):
+            person = Person.objects.create(
+                name="Fred", hobbies="", employer=Company.objects.create(name="KFC")
+            )
+            Pet.objects.create(
+                name="Garfield",
+                toys="",
+                species="cat",
+                owner=person,
+                sold_from=PetStore.objects.create(name="PetCo"),
+            )
+
+    def test_get_expand_paths(self):
+        self.assertEqual(
+            get_expand_paths(PetSerializer),
+            ["diet", "owner", "owner.employer", "sold_from"],
+        )
+        self.assertEqual(get_expand_paths(PetSerializer, max_depth=1), [
+            "diet", "owner", "sold_from"
+        ])
+        self.assertEqual(
+            get_expand_paths(PetWithOwnerSerializer), ["owner", "owner.pets"]
+        )
+
+    def test_reports_n_plus_one_path(self):
+        failures = check_expand_queries(
+            lambda path: self.client.get(reverse("pet-list"), {"expand": path}),
+            self.seed,
+            ["owner"],
+            rows=2,
+        )
+
+        self.assertEqual(failures, ["expand=owner: 3 queries with 2 rows, 5 with 4 rows"])
+
+    def test_reports_deferred_loads(self):
+        def fetch(path):
+            pets = Pet.objects.only("id", "name", "owner")
+            return PetSerializer(pets, many=True, fields=["name", "toys"]).data
+
+        failures = check_expand_queries(fetch, self.seed, [""], rows=1)
+
+        self.assertEqual(
+            failures,
+            [
+                "expand=: 2 queries with 1 rows, 3 with 2 rows",
+                "expand=: deferred field Pet.toys loaded 2 times while "
+                "rendering the root serializer",
+            ],
+        )
+
+    @patch("tests.testapp.views.PetViewSet.filter_backends", [FlexFieldsFilterBackend])
+    @patch(
+        "tests.testapp.views.PetViewSet.permit_list_expands",
+        ["owner.employer", "sold_from", "diet"],
+    )
+    def test_planned_list_passes(self):
+        self.assertListExpandsConstant(reverse("pet-list"), PetSerializer, self.seed)
@@ -0,0 +1,73 @@
+from django.test import TestCase
+from django.utils.datastructures import MultiValueDict
+
+from rest_flex_fields.serializers import FlexFieldsListSerializer
+from rest_flex_fields.tracing import InMemoryTracer, Tracer, set_tracer
+from tests.helpers import MockRequest
+from tests.testapp.models import Company, Person, Pet
+from tests.testapp.serializers import PetSerializer
+
+
+class CompiledPetSerializer(PetSerializer):
+    class Meta(PetSerializer.Meta):
+        list_serializer_class = FlexFieldsListSerializer
+
+
+def make_pet(name="Garfield"):
+    return Pet(
+        name=name,
+        owner=Person(name="Fred", employer=Company(name="McDonalds")),
+    )
+
+
+class TestTracing(TestCase):
+    def setUp(self):
+        self.tracer = InMemoryTracer()
+        set_tracer(self.tracer)
+
+    def tearDown(self):
+        set_tracer(None)
+
+    def test_noop_tracer_by_default(self):
+        set_tracer(None)
+        tracer = Tracer()
+
+        with tracer.span("flex.serialize", path="") as span:
+            span.set_attribute("rows", 1)
+
+        self.assertFalse(tracer.enabled)
+
+    def test_spans_for_parsing_expansion_and_serialization(self):
+        request = MockRequest(MultiValueDict({"expand": ["owner.employer"]}))
+        PetSerializer(make_pet(), context={"request": request}).data
+
+        self.assertEqual(
+            [span.attributes["param"] for span in self.tracer.find("flex.parse")],
+            ["expand", "fields", "omit"],
+        )
+        self.assertEqual(
+            [span.attributes["path"] for span in self.tracer.find("flex.expand")],
+            ["owner", "owner.employer"],
+        )
+
+        (root,) = [span for span in self.tracer.spans if span.name == "flex.serialize"]
+        self.assertEqual(root.attributes, {"path": "", "serializer": "PetSerializer", "rows": 1})
+
+        (owner,) = [child for child in root.children if child.name == "flex.serialize"]
+        self.assertEqual(owner.attributes["path"], "owner")
+        self.assertEqual(owner.attributes["serializer"], "PersonSerializer")
+        self.assertEqual(owner.children[-1].attributes["path"], "owner.employer")
+
+    def test_nested_rows_are_aggregated_per_path(self):
+        pets = [make_pet(name) for name in ("Garfield", "Odie", "Nermal")]
+        CompiledPetSerializer(pets, many=True, expand=["owner.employer"]).data
+
+        (root,) = [span for span in self.tracer.spans if span.name == "flex.serialize"]
+        self.assertEqual(root.attributes["rows"], 3)
+
+        paths = {
+            span.attributes["path"]: span.attributes["rows"]
+            for span in root.find("flex.serialize")[1:]
+        }
+        self.assertEqual(paths, {"owner": 3, "owner.employer": 3})
+        self.assertTrue(all(span.duration >= 0 for span in root.find("flex.serialize")))
@@ -1,14 +1,11 @@
+from unittest.mock import patch
+
 from django.test import TestCase
+from django.utils.datastructures import MultiValueDict
 
 from rest_flex_fields import is_included, is_expanded, WILDCARD_ALL, WILDCARD_ASTERISK
-
-
-class MockRequest(object):
-    def __init__(self, query_params=None, method="GET"):
-        if query_params is None:
-            query_params = {}
-        self.query_params = query_params
-        self.method = method
+from rest_flex_fields.utils import get_flex_param_values, get_request_plan
+from tests.helpers import MockRequest
 
 
 class TestUtils(TestCase):
@@ -47,3 +44,55 @@ class TestUtils(TestCase):
     def test_asterisk_should_be_expanded(self):
         request = MockRequest(query_params={"expand": WILDCARD_ASTERISK})
         self.assertTrue(is_expanded(request, "name"))
+
+    def test_flex_params_are_parsed_once_per_request(self):
+        request = MockRequest(
+            query_params=MultiValueDict({"expand": ["owner.employer,sold_from"]})
+        )
+
+        with patch.object(
+            MultiValueDict, "getlist", autospec=True, side_effect=MultiValueDict.getlist
+        ) as getlist:
+            self.assertEqual(
+                get_flex_param_values(request, "expand"),
+                ["owner.employer", "sold_from"],
+            )
+            self.assertTrue(is_expanded(request, "employer"))
+            self.assertEqual(getlist.call_count, 1)
+
+        self.assertEqual(request._flex_fields_params["expand"], ("owner.employer", "sold_from"))
+
+    def test_flex_params_from_bracketed_list(self):
+        request = MockRequest(query_params=MultiValueDict({"omit[]": ["name", "age"]}))
+        self.assertEqual(get_flex_param_values(request, "omit"), ["name", "age"])
+        self.assertFalse(is_included(request, "age"))
+
+    def test_dotted_fields_are_checked_level_by_level(self):
+        request = MockRequest(
+            query_params={
+                "expand": "owner.employer,sold_from",
+                "fields": "owner.employer,owner.name,sold_from",
+                "omit": "owner.employer.public",
+            }
+        )
+
+        self.assertTrue(is_expanded(request, "owner.employer"))
+        self.assertTrue(is_expanded(request, "owner"))
+        self.assertFalse(is_expanded(request, "sold_from.employer"))
+        self.assertFalse(is_expanded(request, "owner.employer.owner"))
+        self.assertTrue(is_expanded(request, "employer"))
+
+        self.assertTrue(is_included(request, "owner.name"))
+        self.assertTrue(is_included(request, "owner.employer.name"))
+        self.assertFalse(is_included(request, "owner.hobbies"))
+        self.assertFalse(is_included(request, "owner.employer.public"))
+        self.assertTrue(is_included(request, "sold_from.name"))
+
+        self.assertIs(request._flex_fields_plan, get_request_plan(request))
+
+    def test_dotted_fields_with_wildcards(self):
+        request = MockRequest(query_params={"expand": "*,owner.employer"})
+
+        self.assertTrue(is_expanded(request, "sold_from"))
+        self.assertTrue(is_expanded(request, "owner.employer"))
+        self.assertFalse(is_expanded(request, "sold_from.owner"))
@@ -1,3 +1,4 @@
+import json
 from http import HTTPStatus
 from pprint import pprint
 from unittest.mock import patch
@@ -5,11 +6,21 @@ from unittest.mock import patch
 from django.contrib.contenttypes.models import ContentType
 from django.db import connection
 from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from rest_framework.test import APITestCase
-
+from rest_framework import mixins, serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.routers import SimpleRouter
+from rest_framework.test import APIRequestFactory, APITestCase
+from rest_framework.viewsets import GenericViewSet
+
+from rest_flex_fields import FlexFieldsModelSerializer, FlexFieldsModelViewSet
 from rest_flex_fields.filter_backends import FlexFieldsFilterBackend
-from tests.testapp.models import Company, Person, Pet, PetStore, TaggedItem
+from rest_flex_fields.views import FlexFieldsMixin
+from tests.testapp.models import Club, Company, Person, Pet, PetStore, TaggedItem
+from tests.testapp.serializers import PersonWithPetsSerializer, PetSerializer
+from tests.testapp.views import PetViewSet
 
 
 class PetViewTests(APITestCase):
@@ -51,6 +62,15 @@ class PetViewTests(APITestCase):
 
         self.assertEqual(response.data, {"name": "Garfield", "species": "cat"})
 
+    def test_list_with_deeply_nested_fields_and_omit(self):
+        path = ".".join(["owner"] * 400)
+        response = self.client.get(
+            reverse("pet-list"), {"fields": "name," + path, "omit": path}
+        )
+
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.data[0]["name"], "Garfield")
+
     def test_retrieve_sparse_and_deep_expanded(self):
         url = reverse("pet-detail", args=[self.pet.id])
         url = url + "?fields=owner&expand=owner.employer"
@@ -103,6 +123,171 @@ class PetViewTests(APITestCase):
             },
         )
 
+    def test_list_expands_pruned_to_permitted_prefix(self):
+        url = reverse("pet-list") + "?expand=owner.employer&fields=owner"
+        response = self.client.get(url, format="json")
+
+        self.assertEqual(
+            response.data[0], {"owner": {"name": "Fred", "hobbies": "sailing"}}
+        )
+
+    def test_list_streamed(self):
+        Pet.objects.create(
+            name="Odie", toys="bone", species="dog", owner=self.person
+        )
+        url = reverse("pet-list") + "?expand=owner&fields=name,owner"
+        expected = self.client.get(url, format="json").content
+
+        with patch(
+            "tests.testapp.views.PetViewSet.streaming_list_chunk_size", 1
+        ):
+            response = self.client.get(url, format="json")
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(b"".join(response.streaming_content), expected)
+
+    def test_mixin_doesnt_add_read_actions(self):
+        class PetCreateViewSet(
+            FlexFieldsMixin, mixins.CreateModelMixin, GenericViewSet
+        ):
+            serializer_class = PetSerializer
+            queryset = Pet.objects.all()
+
+        router = SimpleRouter()
+
+        self.assertEqual(
+            router.get_method_map(
+                PetCreateViewSet, {"get": "list", "post": "create"}
+            ),
+            {"post": "create"},
+        )
+        self.assertEqual(
+            router.get_method_map(PetCreateViewSet, {"get": "retrieve"}), {}
+        )
+
+    @patch("tests.testapp.views.PetViewSet.etag_version_field", "name")
+    def test_conditional_get_with_overridden_get_object(self):
+        calls = []
+        pet = self.pet
+
+        class MyPetViewSet(PetViewSet):
+            def get_object(self):
+                calls.append(self.kwargs)
+                return pet
+
+        view = MyPetViewSet.as_view({"get": "retrieve"})
+        response = view(APIRequestFactory().get("/me/"))
+
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.data["name"], "Garfield")
+        self.assertEqual(calls, [{}])
+
+        response = view(
+            APIRequestFactory().get("/me/", HTTP_IF_NONE_MATCH=response["ETag"])
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_etag_reads_each_expanded_relation_on_its_own(self):
+        class ClubSerializer(FlexFieldsModelSerializer):
+            class Meta:
+                model = Club
+                fields = ["name"]
+
+        class PersonWithPetsAndClubsSerializer(PersonWithPetsSerializer):
+            class Meta(PersonWithPetsSerializer.Meta):
+                expandable_fields = {
+                    "clubs": (ClubSerializer, {"many": True}),
+                    **PersonWithPetsSerializer.Meta.expandable_fields,
+                }
+
+        class PersonViewSet(FlexFieldsModelViewSet):
+            serializer_class = PersonWithPetsAndClubsSerializer
+            queryset = Person.objects.all()
+            permit_list_expands = ["pets", "clubs"]
+            etag_version_field = "name"
+
+        view = PersonViewSet(action="list", format_kwarg=None)
+        view.request = Request(
+            APIRequestFactory().get("/", {"expand": "pets,clubs"})
+        )
+        view.request.accepted_renderer = JSONRenderer()
+
+        with CaptureQueriesContext(connection) as context:
+            view._get_etag(view.request, Person.objects.all())
+
+        self.assertEqual(len(context.captured_queries), 3)
+
+        for query in context.captured_queries:
+            self.assertFalse(
+                "testapp_pet" in query["sql"] and "testapp_club" in query["sql"]
+            )
+
+    @patch("tests.testapp.views.PetViewSet.etag_version_field", "name")
+    def test_conditional_get_with_plan_aware_etag(self):
+        list_url = reverse("pet-list") + "?expand=owner&fields=name,owner.name"
+        detail_url = reverse("pet-detail", args=[self.pet.id]) + "?expand=owner"
+
+        # Retrieving the object plans its queryset, which builds the fields,
+        # but nothing is serialized.
+        for url, method in (
+            (list_url, "get_fields"),
+            (detail_url, "to_representation"),
+        ):
+            etag = self.client.get(url, format="json")["ETag"]
+
+            with patch(
+                "tests.testapp.serializers.PetSerializer." + method,
+                side_effect=AssertionError,
+            ):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+            self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+            self.assertEqual(response["ETag"], etag)
+
+        etag = self.client.get(list_url, format="json")["ETag"]
+        unexpanded = self.client.get(reverse("pet-list"), format="json")["ETag"]
+        self.assertNotEqual(etag, unexpanded)
+
+        Person.objects.update(name="Zed")
+        response = self.client.get(list_url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.data[0]["owner"], {"name": "Zed"})
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_list_without_etag_builds_queryset_once(self):
+        with patch(
+            "tests.testapp.views.PetViewSet.get_queryset",
+            return_value=Pet.objects.all(),
+        ) as get_queryset:
+            response = self.client.get(reverse("pet-list"), format="json")
+
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotIn("ETag", response)
+        self.assertEqual(get_queryset.call_count, 1)
+
+    @patch("rest_flex_fields.serializers.MAXIMUM_EXPANSION_DEPTH", 1)
+    def test_invalid_expand_rejected_before_queryset_work(self):
+        url = reverse("pet-list") + "?expand=owner.employer"
+
+        with patch(
+            "tests.testapp.views.PetViewSet.get_queryset", side_effect=AssertionError
+        ):
+            response = self.client.get(url, format="json")
+
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_other_actions_dont_build_the_serializer_up_front(self):
+        url = reverse("pet-detail", args=[self.pet.id])
+
+        with patch(
+            "tests.testapp.views.PetViewSet.get_flex_serializer",
+            side_effect=AssertionError,
+        ):
+            response = self.client.delete(url + "?expand=owner")
+
+        self.assertEqual(response.status_code, HTTPStatus.NO_CONTENT)
+
     def test_create_and_return_expanded_field(self):
         url = reverse("pet-list")
         url = url + "?expand=owner"
@@ -196,8 +381,396 @@ class PetViewWithSelectFieldsFilterBackendTests(PetViewTests):
             ),
         )
 
-    # todo: test many to one
-    # todo: test many to many
+    def test_serializer_tree_built_once_per_request(self):
+        from tests.testapp.serializers import PersonSerializer, PetSerializer
+
+        for url in (
+            reverse("pet-list") + "?expand=owner",
+            reverse("pet-detail", args=[self.pet.id]) + "?expand=owner",
+        ):
+            with patch.object(
+                PetSerializer, "get_fields", autospec=True,
+                side_effect=PetSerializer.get_fields,
+            ) as pet_fields, patch.object(
+                PersonSerializer, "get_fields", autospec=True,
+                side_effect=PersonSerializer.get_fields,
+            ) as person_fields:
+                response = self.client.get(url, format="json")
+
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+            self.assertEqual(pet_fields.call_count, 1)
+            self.assertEqual(person_fields.call_count, 1)
+
+    def test_query_planned_from_overridden_get_serializer(self):
+        from tests.testapp.views import PetViewSet
+
+        class OwnerPetViewSet(PetViewSet):
+            def get_serializer(self, *args, **kwargs):
+                kwargs.update(expand=["owner"], fields=["name", "owner"])
+                return super().get_serializer(*args, **kwargs)
+
+        view = OwnerPetViewSet.as_view({"get": "list"})
+
+        with CaptureQueriesContext(connection) as context:
+            response = view(APIRequestFactory().get("/"))
+
+        self.assertEqual(
+            response.data,
+            [{"name": "Garfield", "owner": {"name": "Fred", "hobbies": "sailing"}}],
+        )
+        self.assertEqual(len(context.captured_queries), 1)
+
+    @patch(
+        "tests.testapp.views.PetViewSet.auto_remove_nested_fields_from_query",
+        True,
+        create=True,
+    )
+    def test_query_optimization_prunes_columns_of_expanded_relations(self):
+        url = reverse("pet-list")
+        url = url + "?expand=owner&fields=name,owner.name"
+
+        response = self.client.get(url, format="json")
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.json(), [{"name": "Garfield", "owner": {"name": "Fred"}}])
+
+        self.assertEqual(len(connection.queries), 1)
+        self.assertEqual(
+            connection.queries[0]["sql"],
+            (
+                "SELECT "
+                '"testapp_pet"."id", '
+                '"testapp_pet"."name", '
+                '"testapp_pet"."owner_id", '
+                '"testapp_person"."id", '
+                '"testapp_person"."name" '
+                'FROM "testapp_pet" '
+                'INNER JOIN "testapp_person" ON ("testapp_pet"."owner_id" = "testapp_person"."id")'
+            ),
+        )
+
+    def test_query_optimization_keeps_columns_of_expanded_relations(self):
+        class OwnerSerializer(FlexFieldsModelSerializer):
+            sailor = serializers.SerializerMethodField()
+
+            class Meta:
+                model = Person
+                fields = ["name", "sailor"]
+
+            def get_sailor(self, obj):
+                return "sailing" in obj.hobbies
+
+        class PetWithOwnerSerializer(FlexFieldsModelSerializer):
+            class Meta:
+                model = Pet
+                fields = ["name"]
+                expandable_fields = {"owner": OwnerSerializer}
+
+        class PetViewSet(GenericViewSet):
+            serializer_class = PetWithOwnerSerializer
+            queryset = Pet.objects.all()
+
+        for name in ("Bob", "Alice"):
+            person = Person.objects.create(
+                name=name, hobbies="sailing", employer=self.company
+            )
+            Pet.objects.create(
+                name="Garfield", toys="string", species="cat", owner=person
+            )
+
+        view = PetViewSet(action="list", format_kwarg=None)
+        view.request = Request(APIRequestFactory().get("/", {"expand": "owner"}))
+        queryset = FlexFieldsFilterBackend().filter_queryset(
+            view.request, Pet.objects.all(), view
+        )
+
+        # Columns of expanded relations are only pruned when the view opts
+        # in, so method fields and properties reading them don't load them
+        # one row at a time.
+        with CaptureQueriesContext(connection) as context:
+            data = view.get_serializer(queryset, many=True).data
+
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertEqual([pet["owner"]["sailor"] for pet in data], [True] * 3)
+
+    @patch(
+        "tests.testapp.views.PetViewSet.permit_list_expands", ["owner.employer"]
+    )
+    def test_query_optimization_for_nested_expand(self):
+        for name in ("KFC", "Wendys"):
+            person = Person.objects.create(
+                name="Fred", hobbies="sailing",
+                employer=Company.objects.create(name=name)
+            )
+            Pet.objects.create(
+                name="Garfield", toys="paper ball, string", species="cat",
+                owner=person
+            )
+
+        url = reverse("pet-list")
+        url = url + "?expand=owner.employer"
+
+        response = self.client.get(url, format="json")
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(len(response.json()), 3)
+        self.assertEqual(len(connection.queries), 1)
+        self.assertIn('INNER JOIN "testapp_company"', connection.queries[0]["sql"])
+
+    def test_query_optimization_for_nested_to_many_expand(self):
+        class PersonViewSet(GenericViewSet):
+            serializer_class = PersonWithPetsSerializer
+            queryset = Person.objects.all()
+            auto_remove_nested_fields_from_query = True
+
+        for name in ("Bob", "Alice"):
+            person = Person.objects.create(
+                name=name, hobbies="sailing", employer=self.company
+            )
+            for store_name in ("PetCo", "PetSmart"):
+                Pet.objects.create(
+                    name="Garfield", toys="paper ball, string", species="cat",
+                    owner=person,
+                    sold_from=PetStore.objects.create(name=store_name)
+                )
+
+        view = PersonViewSet(action="list", format_kwarg=None)
+        view.request = Request(
+            APIRequestFactory().get(
+                "/", {"expand": "pets.sold_from", "omit": "pets.toys,pets.diet"}
+            )
+        )
+        queryset = FlexFieldsFilterBackend().filter_queryset(
+            view.request, Person.objects.all(), view
+        )
+
+        with CaptureQueriesContext(connection) as context:
+            data = view.get_serializer(queryset, many=True).data
+
+        self.assertEqual(len(context.captured_queries), 2)
+        self.assertEqual(
+            context.captured_queries[1]["sql"].split(" FROM ")[0],
+            (
+                'SELECT '
+                '"testapp_pet"."id", '
+                '"testapp_pet"."name", '
+                '"testapp_pet"."species", '
+                '"testapp_pet"."owner_id", '
+                '"testapp_pet"."sold_from_id", '
+                '"testapp_petstore"."id", '
+                '"testapp_petstore"."name"'
+            ),
+        )
+        self.assertEqual(
+            [len(person["pets"]) for person in data], [1, 2, 2]
+        )
+        self.assertEqual(data[1]["pets"][1]["sold_from"]["name"], "PetSmart")
+
+    def test_query_optimization_keeps_prefetches_of_the_view(self):
+        class PersonViewSet(GenericViewSet):
+            serializer_class = PersonWithPetsSerializer
+            queryset = Person.objects.all()
+
+        view = PersonViewSet(action="list", format_kwarg=None)
+        view.request = Request(APIRequestFactory().get("/", {"expand": "pets"}))
+        queryset = FlexFieldsFilterBackend().filter_queryset(
+            view.request, Person.objects.prefetch_related("pet_set"), view
+        )
+
+        with CaptureQueriesContext(connection) as context:
+            data = view.get_serializer(queryset, many=True).data
+
+        self.assertEqual(len(context.captured_queries), 2)
+        self.assertEqual(data[0]["pets"][0]["name"], "Garfield")
+
+    def test_bounded_to_many_expand_in_one_query(self):
+        class BoundedPersonSerializer(PersonWithPetsSerializer):
+            class Meta(PersonWithPetsSerializer.Meta):
+                expandable_fields = {
+                    "pets": (
+                        "tests.testapp.PetSerializer",
+                        {
+                            "many": True,
+                            "source": "pet_set",
+                            "fields": ["name"],
+                            "limit": 2,
+                            "ordering": ["-name"],
+                            "truncation_marker": "pets_truncated",
+                        },
+                    )
+                }
+
+        class PersonViewSet(GenericViewSet):
+            serializer_class = BoundedPersonSerializer
+            queryset = Person.objects.all()
+
+        person = Person.objects.create(
+            name="Bob", hobbies="sailing", employer=self.company
+        )
+
+        for name in ("Ace", "Buddy", "Cleo", "Duke"):
+            Pet.objects.create(name=name, toys="", species="dog", owner=person)
+
+        view = PersonViewSet(action="list", format_kwarg=None)
+        view.request = Request(APIRequestFactory().get("/", {"expand": "pets"}))
+        queryset = FlexFieldsFilterBackend().filter_queryset(
+            view.request, Person.objects.order_by("id"), view
+        )
+
+        with CaptureQueriesContext(connection) as context:
+            data = view.get_serializer(queryset, many=True).data
+
+        self.assertEqual(len(context.captured_queries), 2)
+        self.assertEqual(
+            data,
+            [
+                {
+                    "name": "Fred",
+                    "pets": [{"name": "Garfield"}],
+                    "pets_truncated": False,
+                },
+                {
+                    "name": "Bob",
+                    "pets": [{"name": "Duke"}, {"name": "Cleo"}],
+                    "pets_truncated": True,
+                },
+            ],
+        )
+
+        with patch.object(
+            connection.features, "allow_sliced_subqueries_with_in", False
+        ):
+            queryset = FlexFieldsFilterBackend().filter_queryset(
+                view.request, Person.objects.order_by("id"), view
+            )
+            self.assertEqual(view.get_serializer(queryset, many=True).data, data)
+
+        # Without the filter backend, each parent's rows are bounded in
+        # their own query.
+        data = BoundedPersonSerializer(
+            Person.objects.order_by("id"), many=True, expand=["pets"]
+        ).data
+        self.assertEqual(data[1]["pets"], [{"name": "Duke"}, {"name": "Cleo"}])
+        self.assertTrue(data[1]["pets_truncated"])
+
+    def test_bounded_many_to_many_expands_in_one_query(self):
+        class MemberSerializer(FlexFieldsModelSerializer):
+            class Meta:
+                model = Person
+                fields = ["name"]
+
+        class ClubSerializer(FlexFieldsModelSerializer):
+            class Meta:
+                model = Club
+                fields = ["name"]
+                expandable_fields = {
+                    "members": (
+                        MemberSerializer,
+                        {"many": True, "limit": 2, "ordering": ["-name"]},
+                    )
+                }
+
+        class PersonWithClubsSerializer(FlexFieldsModelSerializer):
+            class Meta:
+                model = Person
+                fields = ["name"]
+                expandable_fields = {
+                    "clubs": (ClubSerializer, {"many": True, "limit": 1}),
+                }
+
+        chess, golf = Club.objects.create(name="Chess"), Club.objects.create(name="Golf")
+        people = [self.person] + [
+            Person.objects.create(name=name, hobbies="", employer=self.company)
+            for name in ("Ann", "Zoe", "Max")
+        ]
+        chess.members.set(people)
+        golf.members.set(people[:2])
+
+        def serialize(serializer_class, queryset, expand):
+            class View(GenericViewSet):
+                serializer_class = ClubSerializer
+
+            view = View(action="list", format_kwarg=None)
+            view.serializer_class = serializer_class
+            view.request = Request(APIRequestFactory().get("/", {"expand": expand}))
+            queryset = FlexFieldsFilterBackend().filter_queryset(
+                view.request, queryset, view
+            )
+
+            with CaptureQueriesContext(connection) as context:
+                data = view.get_serializer(queryset, many=True).data
+
+            self.assertEqual(len(context.captured_queries), 2)
+            return data, context.captured_queries[1]["sql"]
+
+        for sliced_subqueries in (True, False):
+            with patch.object(
+                connection.features,
+                "allow_sliced_subqueries_with_in",
+                sliced_subqueries,
+            ):
+                data, sql = serialize(
+                    ClubSerializer, Club.objects.order_by("id"), "members"
+                )
+                self.assertEqual(
+                    data,
+                    [
+                        {"name": "Chess", "members": [{"name": "Zoe"}, {"name": "Max"}]},
+                        {"name": "Golf", "members": [{"name": "Fred"}, {"name": "Ann"}]},
+                    ],
+                )
+                self.assertEqual(" LIMIT " in sql, sliced_subqueries)
+
+                data, _ = serialize(
+                    PersonWithClubsSerializer, Person.objects.order_by("id"), "clubs"
+                )
+                self.assertEqual(
+                    [person["clubs"] for person in data],
+                    [[{"name": "Chess"}]] * 2 + [[{"name": "Chess"}]] * 2,
+                )
+
+        # Only the first limit + 1 rows of each club are fetched.
+        with patch(
+            "rest_flex_fields.serializers.FlexFieldsListSerializer.bound",
+            lambda self, data, limit=None: list(data.all()),
+        ):
+            data, _ = serialize(ClubSerializer, Club.objects.order_by("id"), "members")
+
+        self.assertEqual([len(club["members"]) for club in data], [3, 2])
+
+    def test_streamed_list_prefetches_each_chunk(self):
+        class PersonViewSet(FlexFieldsModelViewSet):
+            serializer_class = PersonWithPetsSerializer
+            queryset = Person.objects.all()
+            filter_backends = [FlexFieldsFilterBackend]
+            permit_list_expands = ["pets"]
+            streaming_list_chunk_size = 2
+
+        for name in ("Bob", "Alice"):
+            person = Person.objects.create(
+                name=name, hobbies="sailing", employer=self.company
+            )
+            Pet.objects.create(
+                name=name + "'s cat", toys="string", species="cat", owner=person
+            )
+
+        view = PersonViewSet.as_view({"get": "list"})
+        response = view(
+            APIRequestFactory().get("/", {"expand": "pets", "fields": "name,pets.name"})
+        )
+
+        with CaptureQueriesContext(connection) as context:
+            content = b"".join(response.streaming_content)
+
+        # One query for the rows and one prefetch per chunk of two people.
+        self.assertEqual(len(context.captured_queries), 3)
+        self.assertEqual(
+            json.loads(content),
+            [
+                {"name": "Fred", "pets": [{"name": "Garfield"}]},
+                {"name": "Bob", "pets": [{"name": "Bob's cat"}]},
+                {"name": "Alice", "pets": [{"name": "Alice's cat"}]},
+            ],
+        )
+
     # todo: test view options for SelectFieldsFilterBackend
 
 
@@ -20,6 +20,11 @@ class Person(models.Model):
     employer = models.ForeignKey(Company, on_delete=models.CASCADE)
 
 
+class Club(models.Model):
+    name = models.CharField(max_length=30)
+    members = models.ManyToManyField(Person, related_name="clubs")
+
+
 class Pet(models.Model):
     name = models.CharField(max_length=30)
     toys = models.CharField(max_length=30)
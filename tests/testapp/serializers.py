@@ -47,6 +47,18 @@ class PetSerializer(FlexFieldsModelSerializer):
         return "pet food"
 
 
+class PersonWithPetsSerializer(FlexFieldsModelSerializer):
+    class Meta:
+        model = Person
+        fields = ["name"]
+        expandable_fields = {
+            "pets": (
+                "tests.testapp.PetSerializer",
+                {"many": True, "source": "pet_set"},
+            )
+        }
+
+
 class TaggedItemSerializer(FlexFieldsModelSerializer):
     content_object = PrimaryKeyRelatedField(read_only=True)
 